@@ -1,23 +1,49 @@
 import time
-import pandas as pd
+import asyncio
+import aiohttp
 import numpy as np
+from binance import ThreadedWebsocketManager
 from binance.client import Client
 from binance.enums import *
 from binance.exceptions import BinanceAPIException
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import heapq
+from collections import deque, namedtuple
+import atexit
 import os
 import psutil
 import json
+import orjson
+import re
+from types import MappingProxyType
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, MemoryHandler, QueueHandler, QueueListener
+from numba import njit
 
 # ======================
 # 配置加载器
 # ======================
+# 时间间隔字符串到Binance常量的映射
+INTERVAL_MAP = MappingProxyType({
+    '1m': Client.KLINE_INTERVAL_1MINUTE,
+    '3m': Client.KLINE_INTERVAL_3MINUTE,
+    '5m': Client.KLINE_INTERVAL_5MINUTE,
+    '15m': Client.KLINE_INTERVAL_15MINUTE,
+    '30m': Client.KLINE_INTERVAL_30MINUTE,
+    '1h': Client.KLINE_INTERVAL_1HOUR,
+    '4h': Client.KLINE_INTERVAL_4HOUR,
+    '1d': Client.KLINE_INTERVAL_1DAY
+})
+
+# 匹配JSON字符串（含转义）或注释，字符串优先匹配以保护其中的//
+JSON_COMMENT_PATTERN = re.compile(r'"(?:\\.|[^"\\])*"|//[^\n]*|/\*.*?\*/', re.S)
+
 def load_config(config_file='config.json'):
     """加载配置文件（支持带注释的JSON格式）"""
     try:
@@ -25,53 +51,11 @@ def load_config(config_file='config.json'):
         with open(config_file, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        # 简单的注释去除（处理行尾注释）
-        lines = content.split('\n')
-        cleaned_lines = []
-        for line in lines:
-            # 找到注释位置，但要避免字符串内的//
-            in_string = False
-            escape_next = False
-            comment_pos = -1
-            
-            for i, char in enumerate(line):
-                if escape_next:
-                    escape_next = False
-                    continue
-                    
-                if char == '\\':
-                    escape_next = True
-                    continue
-                    
-                if char == '"':
-                    in_string = not in_string
-                    continue
-                    
-                if not in_string and char == '/' and i + 1 < len(line) and line[i + 1] == '/':
-                    comment_pos = i
-                    break
-            
-            # 去除注释部分
-            if comment_pos >= 0:
-                line = line[:comment_pos].rstrip()
-            
-            cleaned_lines.append(line)
-        
-        # 重新组装并解析JSON
-        cleaned_content = '\n'.join(cleaned_lines)
-        config_data = json.loads(cleaned_content)
-        
-        # 转换时间间隔字符串为Binance常量
-        interval_map = {
-            '1m': Client.KLINE_INTERVAL_1MINUTE,
-            '3m': Client.KLINE_INTERVAL_3MINUTE,
-            '5m': Client.KLINE_INTERVAL_5MINUTE,
-            '15m': Client.KLINE_INTERVAL_15MINUTE,
-            '30m': Client.KLINE_INTERVAL_30MINUTE,
-            '1h': Client.KLINE_INTERVAL_1HOUR,
-            '4h': Client.KLINE_INTERVAL_4HOUR,
-            '1d': Client.KLINE_INTERVAL_1DAY
-        }
+        # 去除注释：一次正则扫描，字符串原样保留，//与/* */注释删除
+        cleaned_content = JSON_COMMENT_PATTERN.sub(
+            lambda m: m.group(0) if m.group(0).startswith('"') else '', content
+        )
+        config_data = orjson.loads(cleaned_content)
         
         # 构建CONFIG字典
         CONFIG = {
@@ -90,7 +74,7 @@ def load_config(config_file='config.json'):
             'LEVERAGE': config_data['trading']['leverage'],
             'RISK_PERCENT': config_data['trading']['risk_percent'],
             'MAX_DAILY_TRADES': config_data['trading']['max_daily_trades'],
-            'TRADE_INTERVAL': interval_map.get(config_data['trading']['trade_interval'], Client.KLINE_INTERVAL_15MINUTE),
+            'TRADE_INTERVAL': INTERVAL_MAP.get(config_data['trading']['trade_interval'], Client.KLINE_INTERVAL_15MINUTE),
             
             # 安全参数
             'MAX_SLIPPAGE': config_data['safety']['max_slippage'],
@@ -166,11 +150,43 @@ def validate_config(config, trade_symbols):
 CONFIG, TRADE_SYMBOLS = load_config()
 validate_config(CONFIG, TRADE_SYMBOLS)
 
+# 交易对在运行期间不变：预先生成遍历用的元组和展示用的列表字符串
+_SYMBOLS_TUPLE = tuple(TRADE_SYMBOLS)
+_SYMBOLS_STR = ', '.join(_SYMBOLS_TUPLE)
+
 # ======================
 # 日志系统
 # ======================
+class TimedMemoryHandler(MemoryHandler):
+    """缓冲日志记录，达到条数、ERROR级别或时间间隔时批量写入目标handler"""
+    def __init__(self, capacity, flush_interval, flushLevel, target):
+        super().__init__(capacity, flushLevel=flushLevel, target=target, flushOnClose=True)
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        # 后台定时刷新：交易周期很长时，缓冲的记录也不会滞留超过flush_interval
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            if self.buffer:
+                self.flush()
+        
+    def shouldFlush(self, record):
+        return (super().shouldFlush(record) or
+                time.monotonic() - self.last_flush >= self.flush_interval)
+    
+    def flush(self):
+        super().flush()
+        self.last_flush = time.monotonic()
+    
+    def close(self):
+        self._stopped.set()
+        super().close()
+
 def setup_logger():
-    """设置日志系统"""
+    """设置日志系统（文件写入由后台线程批量完成）"""
     logger = logging.getLogger('trading_bot')
     logger.setLevel(getattr(logging, CONFIG['LOG_LEVEL']))
     
@@ -183,7 +199,21 @@ def setup_logger():
         '%(asctime)s - %(levelname)s - %(message)s'
     )
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    
+    # 交易线程只负责入队，写文件在监听线程中按批进行，ERROR立即落盘
+    buffer_handler = TimedMemoryHandler(
+        capacity=64, flush_interval=0.5, flushLevel=logging.ERROR, target=handler
+    )
+    log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, buffer_handler, respect_handler_level=True)
+    listener.start()
+    
+    def stop_listener():
+        listener.stop()
+        buffer_handler.close()
+    atexit.register(stop_listener)
+    
     return logger
 
 logger = setup_logger()
@@ -197,28 +227,51 @@ retry = Retry(
     backoff_factor=0.5,
     status_forcelist=[500, 502, 503, 504]
 )
-adapter = HTTPAdapter(max_retries=retry)
+adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=8)
 session.mount('https://', adapter)
 
 # ======================
 # 增强的币安客户端
 # ======================
+# 常见API错误码说明
+API_ERROR_CODES = MappingProxyType({
+    -1003: "速率限制超过",
+    -1015: "市场波动过大",
+    -1021: "时间同步错误",
+    -2010: "余额不足",
+    -2019: "保证金不足"
+})
+
 class EnhancedBinanceClient:
     def __init__(self, api_key, api_secret, testnet=False):
         self.client = Client(api_key, api_secret, testnet=testnet)
         self.last_call = time.time()
         self.call_count = 0
+        self.rate_lock = threading.Lock()  # 多个交易对线程共享同一速率限制
+        
+        # 币安客户端自带的会话同样使用重试和连接池（只在初始化时挂载一次）
+        self.client.session.mount(
+            'https://', HTTPAdapter(max_retries=retry, pool_connections=32, pool_maxsize=64)
+        )
+        self.client.session.headers['Accept-Encoding'] = 'gzip'
+        
+    def reserve_slot(self):
+        """速率限制：加锁预约下一个发送时间（请求间隔0.1秒），返回需要等待的秒数"""
+        with self.rate_lock:
+            now = time.time()
+            send_at = max(now, self.last_call + 0.1)
+            self.last_call = send_at
+        return send_at - now
         
     def safe_request(self, func, *args, **kwargs):
         """带速率限制的安全请求"""
-        # 速率限制
-        elapsed = time.time() - self.last_call
-        if elapsed < 0.1:
-            time.sleep(0.1 - elapsed)
+        # 预约发送时间，保证并发线程之间的请求间隔
+        wait = self.reserve_slot()
+        if wait > 0:
+            time.sleep(wait)
             
         try:
             result = func(*args, **kwargs)
-            self.last_call = time.time()
             self.call_count += 1
             return result
         except BinanceAPIException as e:
@@ -230,14 +283,7 @@ class EnhancedBinanceClient:
             
     def handle_api_error(self, error):
         """API错误处理"""
-        error_codes = {
-            -1003: "速率限制超过",
-            -1015: "市场波动过大",
-            -1021: "时间同步错误",
-            -2010: "余额不足",
-            -2019: "保证金不足"
-        }
-        msg = error_codes.get(error.code, f"未知错误: {error.code}")
+        msg = API_ERROR_CODES.get(error.code, f"未知错误: {error.code}")
         send_telegram(f"🚨 API错误: {msg}")
         logger.error(f"API错误 {error.code}: {msg}")
 
@@ -247,17 +293,32 @@ client = EnhancedBinanceClient(CONFIG['API_KEY'], CONFIG['API_SECRET'], CONFIG['
 # ======================
 # 系统监控装饰器
 # ======================
+# 内存使用率采样缓存（秒），系统监控线程每次检查时强制刷新
+MEMORY_SAMPLE_TTL = 1.0
+_memory_sample = {'ts': 0.0, 'percent': 0.0}
+
+def get_memory_percent(max_age=MEMORY_SAMPLE_TTL):
+    """获取内存使用率，采样未过期时直接返回缓存值"""
+    now = time.time()
+    if now - _memory_sample['ts'] > max_age:
+        _memory_sample['percent'] = psutil.virtual_memory().percent
+        _memory_sample['ts'] = now
+    return _memory_sample['percent']
+
+# 线程数上限：基础线程之外，主循环为每个交易对各占一个工作线程
+MAX_THREADS = 15 + len(TRADE_SYMBOLS)
+
 def system_guard(func):
     """系统资源监控装饰器"""
     def wrapper(*args, **kwargs):
         # 内存检查
-        memory_percent = psutil.virtual_memory().percent
+        memory_percent = get_memory_percent()
         if memory_percent > CONFIG['MEMORY_LIMIT']:
             send_telegram(f"🛑 系统内存使用{memory_percent:.1f}%，暂停操作")
             return None
             
         # 线程检查
-        if threading.active_count() > 15:
+        if threading.active_count() > MAX_THREADS:
             send_telegram("🛑 线程数过多，系统过载")
             return None
             
@@ -267,25 +328,142 @@ def system_guard(func):
 # ======================
 # 工具函数增强
 # ======================
-def send_telegram(message, silent=False):
-    """增强的Telegram通知"""
-    if CONFIG['TELEGRAM_TOKEN'] and CONFIG['TELEGRAM_CHAT_ID']:
+# Telegram消息队列，由后台线程合并发送，避免网络延迟阻塞交易线程
+TELEGRAM_BATCH_SIZE = 10
+TELEGRAM_MAX_LENGTH = 4096
+TELEGRAM_SEPARATOR = "\n---\n"
+TELEGRAM_QUEUE_SIZE = 64  # 队列上限，Telegram长时间不可用时丢弃最旧消息，避免内存无限增长
+_telegram_queue = queue.Queue(maxsize=TELEGRAM_QUEUE_SIZE)
+_telegram_worker = None
+_telegram_worker_lock = threading.Lock()
+_TELEGRAM_STOP = (None, None)  # 停止标记：后台线程发出手中的消息后退出
+TELEGRAM_STOP_TIMEOUT = 30
+
+def _post_telegram(text, silent):
+    """发送单条Telegram消息，返回是否成功"""
+    url = f"https://api.telegram.org/bot{CONFIG['TELEGRAM_TOKEN']}/sendMessage"
+    try:
+        payload = {
+            'chat_id': CONFIG['TELEGRAM_CHAT_ID'],
+            'text': text,
+            'parse_mode': 'HTML',
+            'disable_notification': silent  # 静默通知选项
+        }
+        resp = session.post(url, json=payload, timeout=5)
+        if not resp.ok:
+            logger.error(f"Telegram发送失败: HTTP {resp.status_code} {resp.text[:200]}")
+            return False
+        if not silent:  # 只有非静默消息才记录到日志
+            logger.info(f"Telegram消息已发送: {text}")
+        return True
+    except Exception as e:
+        logger.error(f"Telegram发送失败: {str(e)}")
+        return False
+
+def _post_telegram_batch(batch):
+    """按先后顺序发送一批(message, silent)消息：只合并相邻且静默属性相同的消息"""
+    groups = []
+    for message, silent in batch:
+        if (groups and groups[-1][1] == silent and
+                len(groups[-1][2]) + len(TELEGRAM_SEPARATOR) + len(message) <= TELEGRAM_MAX_LENGTH):
+            groups[-1][0].append(message)
+            groups[-1][2] += TELEGRAM_SEPARATOR + message
+        else:
+            groups.append([[message], silent, message])
+    
+    for messages, silent, text in groups:
+        # 合并消息被拒（如某条HTML标签不合法）时逐条重发，避免整批丢失
+        if not _post_telegram(text, silent) and len(messages) > 1:
+            for message in messages:
+                _post_telegram(message, silent)
+
+def _telegram_sender():
+    """后台发送线程：收集短时间内到达的消息后一次发送，收到停止标记时发完手中消息后退出"""
+    while True:
+        batch = []
+        stop = False
+        item = _telegram_queue.get()
+        while True:
+            if item is _TELEGRAM_STOP:
+                stop = True
+                break
+            batch.append(item)
+            if len(batch) >= TELEGRAM_BATCH_SIZE:
+                break
+            try:
+                item = _telegram_queue.get(timeout=0.5)
+            except queue.Empty:
+                break
+        if batch:
+            _post_telegram_batch(batch)
+        if stop:
+            return
+
+def flush_telegram():
+    """同步发送所有未发出的消息（程序退出或立即发送前调用）"""
+    global _telegram_worker
+    # 先让后台线程发完已取出的批次并退出，再发送队列中剩余的消息，保持先后顺序
+    with _telegram_worker_lock:
+        worker, _telegram_worker = _telegram_worker, None
+    if worker is not None and worker.is_alive():
         try:
-            url = f"https://api.telegram.org/bot{CONFIG['TELEGRAM_TOKEN']}/sendMessage"
-            payload = {
-                'chat_id': CONFIG['TELEGRAM_CHAT_ID'],
-                'text': message,
-                'parse_mode': 'HTML',
-                'disable_notification': silent  # 静默通知选项
-            }
-            session.post(url, json=payload, timeout=5)
-            if not silent:  # 只有非静默消息才记录到日志
-                logger.info(f"Telegram消息已发送: {message}")
-        except Exception as e:
-            logger.error(f"Telegram发送失败: {str(e)}")
+            _telegram_queue.put(_TELEGRAM_STOP, timeout=TELEGRAM_STOP_TIMEOUT)
+            worker.join(TELEGRAM_STOP_TIMEOUT)
+        except queue.Full:
+            logger.warning("Telegram队列已满，无法通知发送线程退出")
+    
+    batch = []
+    while True:
+        try:
+            item = _telegram_queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is not _TELEGRAM_STOP:
+            batch.append(item)
+    if batch:
+        _post_telegram_batch(batch)
+
+atexit.register(flush_telegram)
+
+def _enqueue_telegram(item):
+    """非阻塞入队；队列已满时丢弃最旧的一条消息"""
+    while True:
+        try:
+            _telegram_queue.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                dropped, _ = _telegram_queue.get_nowait()
+                logger.warning(f"Telegram队列已满，丢弃最旧消息: {str(dropped)[:80]}")
+            except queue.Empty:
+                pass
+
+def send_telegram(message, silent=False, immediate=False):
+    """增强的Telegram通知（默认异步发送，immediate=True时同步发送）"""
+    global _telegram_worker
+    if CONFIG['TELEGRAM_TOKEN'] and CONFIG['TELEGRAM_CHAT_ID']:
+        if immediate:
+            # 先发出后台线程手中和队列中已有的消息，保持先后顺序
+            flush_telegram()
+            _post_telegram(message, silent)
+        else:
+            with _telegram_worker_lock:
+                if _telegram_worker is None:
+                    _telegram_worker = threading.Thread(target=_telegram_sender)
+                    _telegram_worker.daemon = True
+                    _telegram_worker.start()
+            _enqueue_telegram((message, silent))
     if not silent:  # 只有非静默消息才打印到控制台
         print(message)
 
+# 市场状态emoji
+MARKET_STATE_EMOJI = MappingProxyType({
+    'TRENDING': '📈',
+    'OVERSOLD': '🟢',
+    'OVERBOUGHT': '🔴',
+    'RANGING': '↔️'
+})
+
 def send_market_data_telegram(symbol, price, indicators, market_state):
     """发送市场数据到Telegram"""
     try:
@@ -304,19 +482,11 @@ def send_market_data_telegram(symbol, price, indicators, market_state):
         # 确定成交量状态
         volume_status = "📈活跃" if volume_ratio > 1.2 else "📉低迷" if volume_ratio < 0.8 else "➡️正常"
         
-        # 市场状态emoji
-        state_emoji = {
-            'TRENDING': '📈',
-            'OVERSOLD': '🟢', 
-            'OVERBOUGHT': '🔴',
-            'RANGING': '↔️'
-        }
-        
         message = f"""
 📊 <b>{symbol} 市场数据</b>
 
 💰 <b>价格:</b> ${price:.4f}
-📈 <b>市场状态:</b> {state_emoji.get(market_state, '❓')} {market_state}
+📈 <b>市场状态:</b> {MARKET_STATE_EMOJI.get(market_state, '❓')} {market_state}
 
 🔍 <b>技术指标:</b>
 ├ RSI: {rsi:.1f} {rsi_status}
@@ -370,14 +540,6 @@ def send_signal_analysis_telegram(symbol, signal_data):
             else:
                 risk_level = "🔴 高风险"
                 
-            # 市场状态emoji
-            state_emoji = {
-                'TRENDING': '📈',
-                'OVERSOLD': '🟢', 
-                'OVERBOUGHT': '🔴',
-                'RANGING': '↔️'
-            }
-            
             message = f"""
 {strategy_emoji} <b>{symbol} 交易信号确认</b>
 
@@ -396,7 +558,7 @@ def send_signal_analysis_telegram(symbol, signal_data):
 ├ RSI: {rsi:.1f}
 ├ ATR: {atr:.4f}
 ├ 成交量: {volume_ratio:.2f}x
-└ 市场状态: {state_emoji.get(market_state, '❓')} {market_state}
+└ 市场状态: {MARKET_STATE_EMOJI.get(market_state, '❓')} {market_state}
 
 📝 <b>信号依据:</b> {reason}
 
@@ -449,8 +611,23 @@ def send_trade_execution_telegram(symbol, order_result, signal_data):
     except Exception as e:
         logger.error(f"发送交易执行通知失败: {str(e)}")
 
-def get_current_price(symbol, retries=3):
-    """增强的价格获取容错机制"""
+# 推送价格的最长可用时间（秒），超过后回退REST查询
+PRICE_MAX_AGE = 2.0
+
+# 最新成交价: symbol -> (价格, 接收时间)，由K线推送更新
+_last_prices = {}
+
+def get_current_price(symbol, retries=3, max_age=PRICE_MAX_AGE):
+    """增强的价格获取容错机制（优先使用推送的最新价）"""
+    tick = get_current_tick(symbol, retries, max_age)
+    return tick[0] if tick is not None else None
+
+def get_current_tick(symbol, retries=3, max_age=PRICE_MAX_AGE):
+    """获取最新价格及其接收时间 (价格, 时间戳)，推送价格沿用推送到达的时间"""
+    cached = _last_prices.get(symbol)
+    if cached is not None and time.time() - cached[1] < max_age:
+        return cached
+    
     for i in range(retries):
         try:
             if CONFIG['TRADING_TYPE'] == 'futures':
@@ -461,17 +638,18 @@ def get_current_price(symbol, retries=3):
                 ticker = client.safe_request(
                     client.client.get_symbol_ticker, symbol=symbol
                 )
-            return float(ticker['price'])
+            return float(ticker['price']), time.time()
         except Exception as e:
             logger.warning(f"获取{symbol}价格失败(尝试{i+1}/{retries}): {str(e)}")
             if i == retries - 1:
                 # 备用方案：使用最近K线价格
                 try:
-                    df = fetch_klines(symbol, '1m', 1)
-                    if df is not None and not df.empty:
-                        backup_price = df['close'].iloc[-1]
+                    candles = fetch_klines(symbol, '1m', 1)
+                    if candles is not None and len(candles.close):
+                        backup_price = float(candles.close[-1])
                         logger.info(f"使用备用价格获取方式: {symbol} = {backup_price}")
-                        return backup_price
+                        # 时间取该K线的收盘时间，价格年龄检查不会把它当作最新价
+                        return backup_price, (int(candles.timestamp[-1]) + 60000) / 1000
                 except Exception as backup_e:
                     logger.error(f"备用价格获取也失败: {str(backup_e)}")
             time.sleep(0.5)
@@ -480,210 +658,779 @@ def get_current_price(symbol, retries=3):
 # ======================
 # 增强的数据获取
 # ======================
+# K线周期对应的秒数，用于判断缓存是否已包含最新收盘K线
+INTERVAL_SECONDS = MappingProxyType({
+    '1m': 60,
+    '3m': 180,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 14400,
+    '1d': 86400
+})
+
+# K线数据：各字段为按时间排列的一维 ndarray，timestamp 为开盘时间(ms)，调用方只读
+Candles = namedtuple('Candles', ['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+
+# K线缓存: (symbol, interval, limit) -> 只含已收盘K线的 Candles
+# 已收盘K线不再变化，缓存在下一根K线收盘前有效；未收盘K线不缓存，与推送路径一致
+_KLINE_CACHE = {}
+
+# 批量获取K线时的最大并发请求数（控制API权重消耗）
+KLINE_MAX_CONCURRENCY = 8
+
+def last_closed_open_time(interval):
+    """当前最新一根已收盘K线的开盘时间(ms)"""
+    seconds = INTERVAL_SECONDS.get(interval, 60)
+    return (int(time.time() // seconds) - 1) * seconds * 1000
+
+def closed_klines(klines, limit):
+    """去掉未收盘的K线（收盘时间晚于当前时间），保留最近limit根"""
+    now_ms = time.time() * 1000
+    return [k for k in klines if k[6] < now_ms][-limit:]
+
+def cached_klines(symbol, interval, limit):
+    """读取K线缓存，缓存中尚无最新收盘K线时返回None"""
+    cached = _KLINE_CACHE.get((symbol, interval, limit))
+    if cached is not None and cached.timestamp[-1] >= last_closed_open_time(interval):
+        return cached
+    return None
+
+def parse_klines(klines):
+    """将原始K线列表转换为 Candles"""
+    # 按列直接转换类型，只保留策略用到的OHLCV列
+    raw = np.asarray(klines, dtype=object)
+    fields = []
+    for column, dtype in enumerate((np.int64,) + (np.float64,) * 5):
+        values = raw[:, column].astype(dtype)
+        values.flags.writeable = False  # 与推送视图一致，缓存共享时防止被修改
+        fields.append(values)
+    return Candles(*fields)
+
+# ======================
+# 实时K线推送
+# ======================
+_ws_manager = None
+_ws_manager_lock = threading.Lock()
+
+def get_websocket_manager():
+    """获取共享的websocket管理器（首次调用时启动）"""
+    global _ws_manager
+    with _ws_manager_lock:
+        if _ws_manager is None:
+            _ws_manager = ThreadedWebsocketManager(
+                CONFIG['API_KEY'], CONFIG['API_SECRET'], testnet=CONFIG['TESTNET']
+            )
+            _ws_manager.daemon = True
+            _ws_manager.start()
+        return _ws_manager
+
+class CandleBuffer:
+    """固定容量的K线环形缓冲（结构数组布局，预分配后不再申请内存）
+    
+    每根K线同时写入位置 i 和 i+size，最近 size 根K线在数组中总是连续的，
+    读取时直接返回切片视图而无需复制。视图在其后 size-limit 根K线写入前保持有效。
+    """
+    def __init__(self, size=256):
+        self.size = size
+        self.t = np.zeros(2 * size, dtype=np.int64)
+        self.o = np.empty(2 * size, dtype=np.float64)
+        self.h = np.empty(2 * size, dtype=np.float64)
+        self.l = np.empty(2 * size, dtype=np.float64)
+        self.c = np.empty(2 * size, dtype=np.float64)
+        self.v = np.empty(2 * size, dtype=np.float64)
+        self.count = 0  # 累计写入的K线数
+        
+    def __len__(self):
+        return min(self.count, self.size)
+    
+    def push(self, t, o, h, l, c, v):
+        """写入一根K线，覆盖最旧的数据"""
+        i = self.count % self.size
+        for j in (i, i + self.size):
+            self.t[j] = t
+            self.o[j] = o
+            self.h[j] = h
+            self.l[j] = l
+            self.c[j] = c
+            self.v[j] = v
+        self.count += 1
+    
+    def last_time(self):
+        """最新K线的开盘时间(ms)，缓冲为空时返回None"""
+        if self.count == 0:
+            return None
+        return int(self.t[(self.count - 1) % self.size])
+    
+    def view(self, limit):
+        """按时间顺序返回最近limit根K线的只读视图（Candles）"""
+        limit = min(limit, len(self))
+        end = (self.count - 1) % self.size + self.size + 1
+        fields = []
+        for field in (self.t, self.o, self.h, self.l, self.c, self.v):
+            part = field[end - limit:end]
+            part.flags.writeable = False
+            fields.append(part)
+        return Candles(*fields)
+
+class KlineStream:
+    """websocket K线流：按交易对缓存已收盘K线，替代每周期REST轮询"""
+    def __init__(self, symbols, interval, size=256):
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.size = size
+        self.interval_ms = INTERVAL_SECONDS.get(interval, 60) * 1000
+        self.buffers = {symbol: CandleBuffer(size) for symbol in self.symbols}
+        self.states = {}  # symbol -> StreamingState，回填后建立
+        self.needs_backfill = set(self.symbols)
+        self.lock = threading.Lock()
+        self.socket_name = None
+        
+    def start(self):
+        """订阅所有交易对的K线多路复用流"""
+        streams = [f"{symbol.lower()}@kline_{self.interval}" for symbol in self.symbols]
+        try:
+            manager = get_websocket_manager()
+            if CONFIG['TRADING_TYPE'] == 'futures':
+                self.socket_name = manager.start_futures_multiplex_socket(
+                    callback=self._handle_message, streams=streams
+                )
+            else:  # spot
+                self.socket_name = manager.start_multiplex_socket(
+                    callback=self._handle_message, streams=streams
+                )
+            logger.info(f"K线推送已订阅: {', '.join(streams)}")
+        except Exception as e:
+            self.socket_name = None
+            logger.error(f"K线推送订阅失败，回退REST轮询: {str(e)}")
+            return
+        
+        # 订阅后再回填历史，避免遗漏中间的K线
+        for symbol in self.symbols:
+            try:
+                self._backfill(symbol)
+            except Exception as e:
+                logger.warning(f"{symbol} K线回填失败: {str(e)}")
+    
+    def _handle_message(self, msg):
+        """websocket回调：异常只记录日志，避免中断所有交易对共用的推送连接"""
+        try:
+            self._process_message(msg)
+        except Exception as e:
+            symbol = msg.get('data', msg).get('s') if isinstance(msg, dict) else None
+            logger.error(f"处理{symbol}K线推送失败: {str(e)}")
+            if symbol in self.buffers:
+                # 缓冲与指标状态可能已不一致，下次读取时用REST重建
+                with self.lock:
+                    self.needs_backfill.add(symbol)
+    
+    def _process_message(self, msg):
+        """只记录已收盘的K线"""
+        data = msg.get('data', msg)
+        if data.get('e') == 'error':
+            logger.warning(f"K线推送异常: {data.get('m')}")
+            return
+        
+        kline = data.get('k')
+        if not kline:
+            return
+        
+        # 未收盘K线的收盘价即最新成交价
+        symbol = data.get('s')
+        _last_prices[symbol] = (float(kline['c']), time.time())
+        if not kline.get('x'):
+            return
+        
+        open_time = int(kline['t'])
+        with self.lock:
+            buffer = self.buffers.get(symbol)
+            if buffer is None or symbol in self.needs_backfill:
+                return
+            last_time = buffer.last_time()
+            if last_time is not None:
+                if open_time <= last_time:
+                    return  # 重复推送
+                if open_time - last_time > self.interval_ms:
+                    # 断线重连后出现缺口，等待下次读取时用REST回填
+                    self.needs_backfill.add(symbol)
+                    return
+            bar = (
+                open_time, float(kline['o']), float(kline['h']),
+                float(kline['l']), float(kline['c']), float(kline['v'])
+            )
+            buffer.push(*bar)
+            
+            # 增量更新指标
+            state = self.states.get(symbol)
+            if state is not None:
+                state.update(open_time, bar[2], bar[3], bar[4], bar[5])
+    
+    def _backfill(self, symbol):
+        """用REST历史K线回填缓冲（只保留已收盘K线）"""
+        if CONFIG['TRADING_TYPE'] == 'futures':
+            klines = client.safe_request(
+                client.client.futures_klines,
+                symbol=symbol, interval=self.interval, limit=self.size
+            )
+        else:  # spot
+            klines = client.safe_request(
+                client.client.get_klines,
+                symbol=symbol, interval=self.interval, limit=self.size
+            )
+        
+        now_ms = time.time() * 1000
+        buffer = CandleBuffer(self.size)
+        for k in klines:
+            if k[6] < now_ms:
+                buffer.push(int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]))
+        
+        with self.lock:
+            # 保留回填期间已推送的更新K线
+            last_time = buffer.last_time()
+            old = self.buffers[symbol]
+            for bar in zip(*old.view(len(old))):
+                if last_time is None or bar[0] > last_time:
+                    buffer.push(*bar)
+            self.buffers[symbol] = buffer
+            self.states[symbol] = StreamingState.from_candles(buffer.view(len(buffer)), self.size)
+            self.needs_backfill.discard(symbol)
+    
+    def _ready(self, symbol):
+        """推送可用且缓冲已回填"""
+        if self.socket_name is None or symbol not in self.buffers:
+            return False
+        
+        if symbol in self.needs_backfill:
+            try:
+                self._backfill(symbol)
+            except Exception as e:
+                logger.warning(f"{symbol} K线回填失败: {str(e)}")
+                return False
+        return True
+    
+    def _is_stale(self, open_time):
+        """推送中断时最新K线会过期，交给REST获取"""
+        return time.time() * 1000 - open_time > 2 * self.interval_ms + 30000
+    
+    def get_candles(self, symbol, limit):
+        """读取最近limit根已收盘K线的视图，数据不足或已过期时返回None"""
+        if not self._ready(symbol):
+            return None
+        
+        with self.lock:
+            buffer = self.buffers[symbol]
+            if len(buffer) < limit:
+                return None
+            candles = buffer.view(limit)
+        
+        if self._is_stale(candles.timestamp[-1]):
+            return None
+        return candles
+    
+    def get_snapshot(self, symbol, limit):
+        """读取增量维护的最近limit根指标视图，不可用时返回None"""
+        if not self._ready(symbol):
+            return None
+        
+        with self.lock:
+            state = self.states.get(symbol)
+            # 需要足够的历史K线越过指标预热期
+            if state is None or state.count < limit + INDICATOR_WARMUP:
+                return None
+            snap = state.snapshot(limit)
+        
+        if self._is_stale(snap.timestamp[-1]):
+            return None
+        return snap
+
+kline_stream = KlineStream(_SYMBOLS_TUPLE, CONFIG['TRADE_INTERVAL'])
+
 @system_guard
 def fetch_klines(symbol, interval, limit=100):
-    """带数据完整性检查的K线获取"""
+    """带数据完整性检查的已收盘K线获取（优先使用推送数据，新K线收盘前复用缓存）"""
+    if interval == kline_stream.interval:
+        candles = kline_stream.get_candles(symbol, limit)
+        if candles is not None:
+            return candles
+    
+    cached = cached_klines(symbol, interval, limit)
+    if cached is not None:
+        return cached
+    
     try:
+        # 多取一根以便去掉未收盘K线后仍有limit根
         if CONFIG['TRADING_TYPE'] == 'futures':
             klines = client.safe_request(
                 client.client.futures_klines,
-                symbol=symbol, interval=interval, limit=limit
+                symbol=symbol, interval=interval, limit=limit + 1
             )
         else:  # spot
             klines = client.safe_request(
                 client.client.get_klines,
-                symbol=symbol, interval=interval, limit=limit
+                symbol=symbol, interval=interval, limit=limit + 1
             )
+        klines = closed_klines(klines, limit)
         
         # 数据完整性检查
         if len(klines) < limit * 0.9:
             logger.warning(f"{symbol}数据不完整: {len(klines)}/{limit}")
             return None
             
-        df = pd.DataFrame(klines, columns=pd.Index([
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_asset_volume', 'trades',
-            'taker_buy_base', 'taker_buy_quote', 'ignore'
-        ]))
-        
-        # 数据类型转换
-        numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-        df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, axis=1)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        return df.set_index('timestamp')
+        candles = parse_klines(klines)
+        _KLINE_CACHE[(symbol, interval, limit)] = candles
+        return candles
     except Exception as e:
         logger.error(f"获取{symbol}K线失败: {str(e)}")
         return None
 
-def calculate_indicators(df):
-    """增强的技术指标计算"""
-    if df is None or len(df) < 50:
+def api_endpoint(name):
+    """公共REST接口地址（区分现货/期货与测试网）"""
+    if CONFIG['TRADING_TYPE'] == 'futures':
+        base_url = client.client.FUTURES_TESTNET_URL if CONFIG['TESTNET'] else client.client.FUTURES_URL
+        return f"{base_url}/v1/{name}"
+    base_url = client.client.API_TESTNET_URL if CONFIG['TESTNET'] else client.client.API_URL
+    return f"{base_url}/v3/{name}"
+
+# 共享的后台事件循环与持久HTTP会话：监控心跳与批量K线复用同一连接池
+_async_loop = None
+_async_loop_lock = threading.Lock()
+_http_session = None
+
+def get_async_loop():
+    """获取共享事件循环，首次调用时在守护线程中启动"""
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='asyncio', daemon=True).start()
+            _async_loop = loop
+    return _async_loop
+
+def run_async(coro, timeout=None):
+    """在共享事件循环中执行协程并等待结果"""
+    return asyncio.run_coroutine_threadsafe(coro, get_async_loop()).result(timeout)
+
+async def get_http_session():
+    """事件循环内共享的aiohttp会话（只在事件循环线程中调用）"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=CONFIG['API_TIMEOUT'])
+        )
+    return _http_session
+
+def close_http_session():
+    """程序退出时关闭共享会话"""
+    if _http_session is not None and not _http_session.closed:
+        try:
+            run_async(_http_session.close(), timeout=5)
+        except Exception as e:
+            logger.warning(f"关闭HTTP会话失败: {str(e)}")
+
+atexit.register(close_http_session)
+
+async def fetch_klines_many(symbols, interval, limit=100):
+    """并发获取多个交易对的已收盘K线并写入缓存"""
+    url = api_endpoint('klines')
+    semaphore = asyncio.Semaphore(KLINE_MAX_CONCURRENCY)
+    http = await get_http_session()
+    
+    async def fetch_one(symbol):
+        async with semaphore:
+            # 与safe_request共用速率限制；失败的交易对由fetch_klines经safe_request重试
+            await asyncio.sleep(client.reserve_slot())
+            client.call_count += 1
+            params = {'symbol': symbol, 'interval': interval, 'limit': limit + 1}
+            async with http.get(url, params=params) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+    
+    results = await asyncio.gather(
+        *(fetch_one(symbol) for symbol in symbols), return_exceptions=True
+    )
+    
+    fetched = {}
+    for symbol, klines in zip(symbols, results):
+        if isinstance(klines, Exception):
+            logger.warning(f"批量获取{symbol}K线失败: {str(klines)}")
+            continue
+        klines = closed_klines(klines, limit)
+        if len(klines) < limit * 0.9:
+            logger.warning(f"{symbol}数据不完整: {len(klines)}/{limit}")
+            continue
+        
+        candles = parse_klines(klines)
+        _KLINE_CACHE[(symbol, interval, limit)] = candles
+        fetched[symbol] = candles
+    
+    return fetched
+
+def prefetch_klines(symbols, interval, limit=100):
+    """批量预取K线填充缓存，失败的交易对由fetch_klines单独重试"""
+    symbols = [symbol for symbol in symbols if cached_klines(symbol, interval, limit) is None]
+    if not symbols:
+        return {}
+    try:
+        return run_async(fetch_klines_many(symbols, interval, limit))
+    except Exception as e:
+        logger.warning(f"批量获取K线失败: {str(e)}")
+        return {}
+
+# 指标预热长度：动量需要20根前值、布林带/成交量均线需要20根窗口，
+# 其余指标为递推平滑，从首根K线起即有值，因此前20行之后全部有效
+INDICATOR_WARMUP = 20
+
+# 指标参数：RSI/ATR/ADX周期、EMA快慢线、布林带周期与标准差倍数
+INDICATOR_PARAMS = (14, 30, 50, 20, 2.0)
+
+# 信号使用的指标窗口长度（默认100根K线去掉预热期）
+SNAPSHOT_LENGTH = 100 - INDICATOR_WARMUP
+
+# 指标快照：atr_mean 为窗口内ATR均值（标量），其余字段为预热期之后的一维 ndarray，
+# 信号逻辑直接读取数组末尾
+IndicatorSnapshot = namedtuple('IndicatorSnapshot', [
+    'timestamp', 'close', 'momentum', 'rsi', 'atr', 'ema30', 'ema50',
+    'bb_upper', 'bb_middle', 'bb_lower', 'volume_ratio', 'adx', 'market_state', 'atr_mean'
+])
+
+# 增量指标按行保存的浮点字段（IndicatorSnapshot 中时间戳与市场状态之间的部分）
+STREAM_FIELDS = IndicatorSnapshot._fields[1:-2]
+_ATR_ROW = STREAM_FIELDS.index('atr')
+
+def calculate_indicators(candles):
+    """增强的技术指标计算，输入 Candles，返回 IndicatorSnapshot"""
+    if candles is None or len(candles.close) < 50:
         return None
     
     try:
-        # 基础指标
-        df['momentum'] = df['close'] / df['close'].shift(20) - 1
-        
-        # RSI指标 - 使用Wilder's平滑法
-        df['rsi'] = calculate_rsi_accurate(df['close'], 14)
+        high = candles.high
+        low = candles.low
+        close = candles.close
+        volume = candles.volume
+        n = len(close)
         
-        # ATR指标 - 真实波动范围
-        df['atr'] = calculate_atr_accurate(df['high'], df['low'], df['close'], 14)
-        
-        # 指数移动平均
-        df['ema30'] = calculate_ema_accurate(df['close'], 30)
-        df['ema50'] = calculate_ema_accurate(df['close'], 50)
+        # 基础指标
+        momentum = np.full(n, np.nan)
+        momentum[20:] = close[20:] / close[:-20] - 1
         
-        # 布林带
-        df['bb_upper'], df['bb_middle'], df['bb_lower'] = calculate_bollinger_bands(df['close'], 20, 2)
+        # RSI/ATR/EMA/布林带/ADX - 单次遍历的融合内核
+        out = np.empty((8, n), dtype=np.float64)
+        compute_indicators_kernel(high, low, close, *INDICATOR_PARAMS, out)
         
         # 成交量指标
-        df['volume_ma20'] = df['volume'].rolling(20).mean()
-        df['volume_ratio'] = df['volume'] / df['volume_ma20']
-        
-        # ADX趋势强度指标
-        df['adx'] = calculate_adx_accurate(df['high'], df['low'], df['close'], 14)
+        volume_ma20 = np.full(n, np.nan)
+        volume_ma20[19:] = np.lib.stride_tricks.sliding_window_view(volume, 20).mean(axis=1)
+        volume_ratio = volume / volume_ma20
         
         # 市场状态检测
-        df['market_state'] = df.apply(lambda row: detect_market_regime(row), axis=1)
-        
-        return df.dropna()
+        market_state = detect_market_regime(close, out[4], out[6], out[7])
+        
+        w = INDICATOR_WARMUP
+        return IndicatorSnapshot(
+            timestamp=candles.timestamp[w:],
+            close=close[w:],
+            momentum=momentum[w:],
+            rsi=out[0, w:],
+            atr=out[1, w:],
+            ema30=out[2, w:],
+            ema50=out[3, w:],
+            bb_upper=out[4, w:],
+            bb_middle=out[5, w:],
+            bb_lower=out[6, w:],
+            volume_ratio=volume_ratio[w:],
+            adx=out[7, w:],
+            market_state=market_state[w:],
+            atr_mean=float(out[1, w:].mean())
+        )
     except Exception as e:
         logger.error(f"指标计算失败: {str(e)}")
         return None
 
-def calculate_rsi_accurate(close, period=14):
-    """
-    精确计算RSI指标 - 使用Wilder's平滑方法
-    """
-    delta = close.diff()
-    
-    # 分离上涨和下跌
-    gains = delta.where(delta > 0, 0.0)
-    losses = (-delta).where(delta < 0, 0.0)
-    
-    # 使用Wilder's平滑方法 (alpha = 1/period)
-    alpha = 1.0 / period
-    
-    # 计算平均增益和平均损失
-    avg_gains = gains.ewm(alpha=alpha, adjust=False).mean()
-    avg_losses = losses.ewm(alpha=alpha, adjust=False).mean()
-    
-    # 计算相对强度和RSI
-    rs = avg_gains / avg_losses
-    rsi = 100 - (100 / (1 + rs))
-    
-    return rsi
+# 增量指标状态向量的字段下标（_indicator_step 读写）
+_ST_COUNT = 0
+_ST_PREV_HIGH = 1
+_ST_PREV_LOW = 2
+_ST_PREV_CLOSE = 3
+_ST_AVG_GAIN = 4
+_ST_AVG_LOSS = 5
+_ST_ATR = 6
+_ST_DM_PLUS = 7
+_ST_DM_MINUS = 8
+_ST_EMA_FAST = 9
+_ST_EMA_SLOW = 10
+_ST_BB_MEAN = 11
+_ST_BB_M2 = 12
+_ST_ADX = 13
+_ST_ADX_WEIGHT = 14
+_ST_ADX_STARTED = 15
+_ST_SIZE = 16
 
-def calculate_ema_accurate(close, period):
-    """
-    精确计算指数移动平均 - 标准EMA算法
-    """
-    alpha = 2.0 / (period + 1)
-    return close.ewm(alpha=alpha, adjust=False).mean()
+@njit(cache=True)
+def new_indicator_state(bb_period):
+    """创建空的增量指标状态：(状态向量, 布林带滚动窗口)"""
+    state = np.zeros(_ST_SIZE, dtype=np.float64)
+    state[_ST_ADX] = np.nan
+    state[_ST_ADX_WEIGHT] = 1.0
+    return state, np.zeros(bb_period, dtype=np.float64)
 
-def calculate_atr_accurate(high, low, close, period=14):
+@njit(cache=True, nogil=True)
+def _indicator_step(state, window, h, l, c, period, ema_fast, ema_slow, bb_period, bb_std):
     """
-    精确计算平均真实范围(ATR) - Wilder's方法
+    用一根K线更新指标状态，返回 (RSI, ATR, EMA快线, EMA慢线, 布林上轨, 布林中轨, 布林下轨, ADX)
+    
+    - RSI/ATR/ADX使用Wilder's平滑(alpha=1/period)，EMA使用alpha=2/(period+1)，
+      均与pandas ewm(adjust=False)一致（首值为种子）
+    - 布林带为bb_period滚动均值±bb_std倍样本标准差（滑动窗口Welford更新），不足窗口时为NaN
     """
-    # 计算真实范围的三个组成部分
-    tr1 = high - low
-    tr2 = (high - close.shift()).abs()
-    tr3 = (low - close.shift()).abs()
+    i = int(state[_ST_COUNT])
+    wilder = 1.0 / period
+    alpha_fast = 2.0 / (ema_fast + 1)
+    alpha_slow = 2.0 / (ema_slow + 1)
     
-    # 真实范围是三者中的最大值
-    true_range = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    if i == 0:
+        state[_ST_ATR] = h - l
+        state[_ST_EMA_FAST] = c
+        state[_ST_EMA_SLOW] = c
+    else:
+        prev_close = state[_ST_PREV_CLOSE]
+        
+        # RSI：涨跌幅的Wilder平滑
+        delta = c - prev_close
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        state[_ST_AVG_GAIN] = (1.0 - wilder) * state[_ST_AVG_GAIN] + wilder * gain
+        state[_ST_AVG_LOSS] = (1.0 - wilder) * state[_ST_AVG_LOSS] + wilder * loss
+        
+        # 真实范围
+        true_range = max(h - l, abs(h - prev_close), abs(l - prev_close))
+        state[_ST_ATR] = (1.0 - wilder) * state[_ST_ATR] + wilder * true_range
+        
+        # 方向运动（-DM与过滤后的+DM比较）
+        up_move = h - state[_ST_PREV_HIGH]
+        down_move = state[_ST_PREV_LOW] - l
+        dm_plus = up_move if (up_move > down_move and up_move > 0) else 0.0
+        dm_minus = down_move if (down_move > dm_plus and down_move > 0) else 0.0
+        state[_ST_DM_PLUS] = (1.0 - wilder) * state[_ST_DM_PLUS] + wilder * dm_plus
+        state[_ST_DM_MINUS] = (1.0 - wilder) * state[_ST_DM_MINUS] + wilder * dm_minus
+        
+        state[_ST_EMA_FAST] = (1.0 - alpha_fast) * state[_ST_EMA_FAST] + alpha_fast * c
+        state[_ST_EMA_SLOW] = (1.0 - alpha_slow) * state[_ST_EMA_SLOW] + alpha_slow * c
     
-    # 使用Wilder's平滑方法计算ATR
-    alpha = 1.0 / period
-    atr = true_range.ewm(alpha=alpha, adjust=False).mean()
+    state[_ST_PREV_HIGH] = h
+    state[_ST_PREV_LOW] = l
+    state[_ST_PREV_CLOSE] = c
+    state[_ST_COUNT] = i + 1
     
-    return atr
-
-def calculate_bollinger_bands(close, period=20, std_dev=2):
-    """
-    精确计算布林带
-    """
-    # 中轨：简单移动平均
-    middle = close.rolling(period).mean()
+    # RSI（平均跌幅为0时：有涨幅记100，否则无定义）
+    avg_gain = state[_ST_AVG_GAIN]
+    avg_loss = state[_ST_AVG_LOSS]
+    if avg_loss > 0:
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    elif avg_gain > 0:
+        rsi = 100.0
+    else:
+        rsi = np.nan
+    
+    # 布林带：滑动窗口的Welford均值/方差更新，长期运行也不会累积抵消误差
+    k = i % bb_period
+    mean = state[_ST_BB_MEAN]
+    if i < bb_period:
+        new_mean = mean + (c - mean) / (i + 1)
+        state[_ST_BB_M2] += (c - mean) * (c - new_mean)
+    else:
+        old = window[k]
+        new_mean = mean + (c - old) / bb_period
+        state[_ST_BB_M2] += (c - old) * (c - new_mean + old - mean)
+    state[_ST_BB_MEAN] = new_mean
+    window[k] = c
+    if i >= bb_period - 1:
+        variance = state[_ST_BB_M2] / (bb_period - 1)
+        std = np.sqrt(variance) if variance > 0 else 0.0
+        bb_upper = new_mean + bb_std * std
+        bb_middle = new_mean
+        bb_lower = new_mean - bb_std * std
+    else:
+        bb_upper = np.nan
+        bb_middle = np.nan
+        bb_lower = np.nan
     
-    # 标准差
-    std = close.rolling(period).std()
+    # DX（无方向运动时无定义），ADX为DX的Wilder平滑并跳过NaN
+    atr = state[_ST_ATR]
+    dx = np.nan
+    if atr > 0:
+        di_plus = 100.0 * state[_ST_DM_PLUS] / atr
+        di_minus = 100.0 * state[_ST_DM_MINUS] / atr
+        di_sum = di_plus + di_minus
+        if di_sum > 0:
+            dx = 100.0 * abs(di_plus - di_minus) / di_sum
     
-    # 上轨和下轨
-    upper = middle + (std * std_dev)
-    lower = middle - (std * std_dev)
+    if state[_ST_ADX_STARTED] > 0:
+        state[_ST_ADX_WEIGHT] *= 1.0 - wilder
+        if not np.isnan(dx):
+            weight = state[_ST_ADX_WEIGHT]
+            state[_ST_ADX] = (weight * state[_ST_ADX] + wilder * dx) / (weight + wilder)
+            state[_ST_ADX_WEIGHT] = 1.0
+    elif not np.isnan(dx):
+        state[_ST_ADX] = dx
+        state[_ST_ADX_STARTED] = 1.0
     
-    return upper, middle, lower
+    return (rsi, atr, state[_ST_EMA_FAST], state[_ST_EMA_SLOW],
+            bb_upper, bb_middle, bb_lower, state[_ST_ADX])
 
-def calculate_adx_accurate(high, low, close, period=14):
+@njit(cache=True, nogil=True)
+def compute_indicators_kernel(high, low, close, period, ema_fast, ema_slow, bb_period, bb_std, out):
     """
-    精确计算ADX指标 - 使用标准Wilder's方法
+    单次遍历计算全部指标，结果写入out的8行：
+    RSI、ATR、EMA快线、EMA慢线、布林上轨、布林中轨、布林下轨、ADX
     """
-    # 计算真实范围
-    tr1 = high - low
-    tr2 = (high - close.shift()).abs()
-    tr3 = (low - close.shift()).abs()
-    true_range = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    
-    # 计算方向运动
-    dm_plus = high.diff()
-    dm_minus = low.diff() * -1
-    
-    # 只保留有效的方向运动
-    dm_plus = dm_plus.where((dm_plus > dm_minus) & (dm_plus > 0), 0)
-    dm_minus = dm_minus.where((dm_minus > dm_plus) & (dm_minus > 0), 0)
+    state, window = new_indicator_state(bb_period)
+    for i in range(close.shape[0]):
+        values = _indicator_step(
+            state, window, high[i], low[i], close[i],
+            period, ema_fast, ema_slow, bb_period, bb_std
+        )
+        for j in range(8):
+            out[j, i] = values[j]
+
+# 市场状态编码，detect_market_regime 返回的整数即为此元组的下标
+MARKET_STATES = ('UNKNOWN', 'TRENDING', 'OVERSOLD', 'OVERBOUGHT', 'RANGING')
+MARKET_STATE_TRENDING = MARKET_STATES.index('TRENDING')
+
+def detect_market_regime(close, bb_upper, bb_lower, adx):
+    """市场状态检测器（整列向量化，返回 MARKET_STATES 下标）"""
+    # 使用ADX识别趋势强度，布林带位置识别超买超卖
+    # 推送路径传入Python标量，用np.divide保证带宽为0（价格横盘）时得到nan而不是抛出异常
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bb_position = np.divide(np.subtract(close, bb_lower), np.subtract(bb_upper, bb_lower))
     
-    # 使用Wilder's平滑
-    alpha = 1.0 / period
+    return np.select(
+        [np.isnan(adx), adx > 25, bb_position < 0.3, bb_position > 0.7],
+        [0, 1, 2, 3],
+        default=4
+    ).astype(np.int8)
+
+class StreamingState:
+    """单个交易对的增量指标：每根收盘K线O(1)更新，保留最近size根的指标值"""
+    def __init__(self, size=256, atr_window=SNAPSHOT_LENGTH):
+        self.size = size
+        self.atr_window = min(atr_window, size)
+        self.atr_sum = 0.0  # 最近 atr_window 根ATR之和
+        self.state, self.window = new_indicator_state(INDICATOR_PARAMS[3])
+        self.closes = deque(maxlen=20)  # 之前20根收盘价，用于动量
+        self.volumes = deque(maxlen=20)  # 最近20根成交量，用于成交量均线
+        # 指标历史：与 CandleBuffer 相同的双写环形布局，快照直接返回视图
+        self.t = np.zeros(2 * size, dtype=np.int64)
+        self.values = np.empty((len(STREAM_FIELDS), 2 * size), dtype=np.float64)
+        self.codes = np.zeros(2 * size, dtype=np.int8)
+        self.count = 0
+        self._snapshot = None  # ((count, limit), 快照)，无新K线时返回同一快照对象
     
-    atr_smooth = true_range.ewm(alpha=alpha, adjust=False).mean()
-    dm_plus_smooth = dm_plus.ewm(alpha=alpha, adjust=False).mean()
-    dm_minus_smooth = dm_minus.ewm(alpha=alpha, adjust=False).mean()
+    @classmethod
+    def from_candles(cls, candles, size=256):
+        """用历史K线回放出指标状态"""
+        streaming = cls(size)
+        for bar in zip(candles.timestamp, candles.high, candles.low, candles.close, candles.volume):
+            streaming.update(*bar)
+        return streaming
     
-    # 计算方向指标
-    di_plus = 100 * (dm_plus_smooth / atr_smooth)
-    di_minus = 100 * (dm_minus_smooth / atr_smooth)
+    def __len__(self):
+        return min(self.count, self.size)
     
-    # 计算DX
-    dx = 100 * (di_plus - di_minus).abs() / (di_plus + di_minus)
+    def update(self, t, h, l, c, v):
+        """写入一根收盘K线并更新全部指标"""
+        rsi, atr, ema30, ema50, bb_upper, bb_middle, bb_lower, adx = _indicator_step(
+            self.state, self.window, h, l, c, *INDICATOR_PARAMS
+        )
+        
+        momentum = c / self.closes[0] - 1 if len(self.closes) == 20 else np.nan
+        self.closes.append(c)
+        
+        self.volumes.append(v)
+        volume_ma20 = sum(self.volumes) / 20 if len(self.volumes) == 20 else np.nan
+        volume_ratio = v / volume_ma20 if volume_ma20 > 0 else np.nan
+        
+        code = detect_market_regime(c, bb_upper, bb_lower, adx)
+        
+        # ATR滚动和：加入新值并移出窗口外的旧值（须在覆盖写入前读取）
+        self.atr_sum += atr
+        if self.count >= self.atr_window:
+            self.atr_sum -= self.values[_ATR_ROW, (self.count - self.atr_window) % self.size]
+        
+        i = self.count % self.size
+        for j in (i, i + self.size):
+            self.t[j] = t
+            self.values[:, j] = (c, momentum, rsi, atr, ema30, ema50,
+                                 bb_upper, bb_middle, bb_lower, volume_ratio, adx)
+            self.codes[j] = code
+        self.count += 1
+        
+        # 每满一个窗口按数组精确重算一次，避免增减累积舍入误差
+        if self.count % self.atr_window == 0:
+            end = i + self.size + 1
+            self.atr_sum = float(self.values[_ATR_ROW, end - self.atr_window:end].sum())
     
-    # 计算ADX (DX的平滑值)
-    adx = dx.ewm(alpha=alpha, adjust=False).mean()
+    def atr_mean(self):
+        """最近 atr_window 根K线的ATR均值"""
+        return self.atr_sum / min(self.count, self.atr_window) if self.count else np.nan
     
-    return adx
-
-def detect_market_regime(row):
-    """市场状态检测器"""
-    try:
-        # 使用ADX识别趋势强度
-        adx = row['adx']
-        bb_position = (row['close'] - row['bb_lower']) / (row['bb_upper'] - row['bb_lower'])
-        
-        if pd.isna(adx):
-            return 'UNKNOWN'
-        
-        if adx > 25:
-            return 'TRENDING'
-        elif bb_position < 0.3:
-            return 'OVERSOLD'
-        elif bb_position > 0.7:
-            return 'OVERBOUGHT'
-        else:
-            return 'RANGING'
-    except Exception:
-        return 'UNKNOWN'
+    def snapshot(self, limit):
+        """按时间顺序返回最近limit根K线指标的只读视图（IndicatorSnapshot）"""
+        limit = min(limit, len(self))
+        key = (self.count, limit)
+        if self._snapshot is not None and self._snapshot[0] == key:
+            return self._snapshot[1]
+        
+        end = (self.count - 1) % self.size + self.size + 1
+        fields = [self.t[end - limit:end]]
+        fields.extend(row[end - limit:end] for row in self.values)
+        fields.append(self.codes[end - limit:end])
+        for part in fields:
+            part.flags.writeable = False
+        atr_mean = self.atr_mean() if limit == self.atr_window else float(fields[1 + _ATR_ROW].mean())
+        snap = IndicatorSnapshot(*fields, atr_mean)
+        self._snapshot = (key, snap)
+        return snap
 
 # ======================
 # 订单管理器
 # ======================
+# 订单未成交的超时时间（秒）
+ORDER_TIMEOUT = 120
+
 class OrderManager:
     def __init__(self):
         self.open_orders = {}
         self.position_lock = threading.Lock()
-        self.order_timeouts = {}
-        self.trade_history = []
+        self.order_timeouts = []  # (截止时间, 订单ID) 小顶堆
+        self.timeout_condition = threading.Condition(self.position_lock)
+        # 只保留参数优化和灾难恢复需要的最近交易
+        self.trade_history = deque(maxlen=max(50, CONFIG['PERFORMANCE_WINDOW']))
+        self.user_socket = None
+        # 用户数据流事件交给工作线程处理：下单期间持有position_lock，
+        # 在websocket回调中等锁会阻塞共用事件循环上的所有推送（含K线）
+        self.user_events = queue.SimpleQueue()
+        
+    def start_order_stream(self):
+        """订阅用户数据流，订单成交/取消由推送驱动；启动统一的超时处理线程"""
+        try:
+            manager = get_websocket_manager()
+            if CONFIG['TRADING_TYPE'] == 'futures':
+                self.user_socket = manager.start_futures_user_socket(callback=self._handle_user_event)
+            else:  # spot
+                self.user_socket = manager.start_user_socket(callback=self._handle_user_event)
+            logger.info("用户数据流已订阅")
+        except Exception as e:
+            logger.error(f"用户数据流订阅失败，订单将在超时时查询状态: {str(e)}")
+        
+        timeout_thread = threading.Thread(target=self._timeout_worker)
+        timeout_thread.daemon = True
+        timeout_thread.start()
+        
+        event_thread = threading.Thread(target=self._user_event_worker)
+        event_thread.daemon = True
+        event_thread.start()
         
     @system_guard
     def execute_order(self, signal):
@@ -709,13 +1456,9 @@ class OrderManager:
                     'timestamp': time.time()
                 }
                 
-                # 启动订单监控线程
-                monitor_thread = threading.Thread(
-                    target=self._monitor_order, 
-                    args=(order_id, signal)
-                )
-                monitor_thread.daemon = True
-                monitor_thread.start()
+                # 登记超时，成交状态由用户数据流推送
+                heapq.heappush(self.order_timeouts, (time.time() + ORDER_TIMEOUT, order_id))
+                self.timeout_condition.notify()
                 
                 return {'success': True, 'order': main_order}
             except Exception as e:
@@ -726,12 +1469,18 @@ class OrderManager:
                 
     def _pre_execution_check(self, signal):
         """执行前检查"""
-        # 滑点检查
-        current_price = get_current_price(signal['symbol'])
+        # 滑点检查：比较实时价与门限判断所用的收盘价，偏离过大时K线信号已不适用
+        # （优先使用信号生成时获取的最新价，已过期则重新查询）
+        tick = signal.get('tick')
+        if tick is not None and time.time() - tick[1] < PRICE_MAX_AGE:
+            current_price = tick[0]
+        else:
+            current_price = get_current_price(signal['symbol'])
         if not current_price:
             return False
             
-        slippage = abs(current_price - signal['price']) / signal['price']
+        reference_price = signal.get('bar_close', signal['price'])
+        slippage = abs(current_price - reference_price) / reference_price
         if slippage > CONFIG['MAX_SLIPPAGE']:
             send_telegram(f"🚫 {signal['symbol']} 滑点过大: {slippage:.2%}")
             return False
@@ -833,56 +1582,104 @@ class OrderManager:
         logger.info(f"使用配置的初始余额: {CONFIG['INITIAL_BALANCE']}")
         return CONFIG['INITIAL_BALANCE']
     
-    def _monitor_order(self, order_id, signal):
-        """订单生命周期监控"""
-        start_time = time.time()
-        symbol = signal['symbol']
-        
-        while time.time() - start_time < 120:  # 2分钟超时
+    def _handle_user_event(self, msg):
+        """用户数据流回调：只入队，不在websocket事件循环中等锁"""
+        self.user_events.put(msg)
+    
+    def _user_event_worker(self):
+        """用户数据流事件处理线程"""
+        while True:
+            msg = self.user_events.get()
             try:
-                if CONFIG['TRADING_TYPE'] == 'futures':
-                    order_status = client.safe_request(
-                        client.client.futures_get_order,
-                        symbol=symbol,
-                        orderId=order_id
-                    )
-                else:  # spot
-                    order_status = client.safe_request(
-                        client.client.get_order,
-                        symbol=symbol,
-                        orderId=order_id
-                    )
-                
-                status = order_status['status']
-                
-                if status == 'FILLED':
-                    # 订单完成，记录交易历史
-                    self.trade_history.append({
-                        'symbol': symbol,
-                        'side': 'BUY',
-                        'size': float(order_status['executedQty']),
-                        'price': float(order_status['avgPrice']),
-                        'timestamp': time.time(),
-                        'signal_type': signal['type']
-                    })
-                    
-                    if order_id in self.open_orders:
-                        del self.open_orders[order_id]
-                    
-                    send_telegram(f"✅ {symbol} 订单已成交 (ID: {order_id})")
-                    return True
-                    
-                elif status == 'CANCELED':
-                    if order_id in self.open_orders:
-                        del self.open_orders[order_id]
-                    send_telegram(f"❌ {symbol} 订单已取消 (ID: {order_id})")
-                    return False
-                    
-                time.sleep(5)
-                
+                self._process_user_event(msg)
             except Exception as e:
-                logger.error(f"订单监控异常: {str(e)}")
-                time.sleep(5)
+                logger.error(f"处理用户数据流事件失败: {str(e)}")
+    
+    def _process_user_event(self, msg):
+        """解析订单更新事件"""
+        event = msg.get('e')
+        if event == 'ORDER_TRADE_UPDATE':  # 期货
+            order = msg['o']
+            executed_qty = float(order['z'])
+            self._on_order_status(order['i'], order['X'], executed_qty, float(order['ap']))
+        elif event == 'executionReport':  # 现货
+            executed_qty = float(msg['z'])
+            avg_price = float(msg['Z']) / executed_qty if executed_qty else float(msg['L'])
+            self._on_order_status(msg['i'], msg['X'], executed_qty, avg_price)
+        elif event == 'error':
+            logger.warning(f"用户数据流异常: {msg.get('m')}")
+    
+    def _on_order_status(self, order_id, status, executed_qty, avg_price):
+        """处理订单终态：成交记入交易历史，取消则移除"""
+        with self.position_lock:
+            entry = self.open_orders.get(order_id)
+            if entry is None:
+                return
+            
+            if status == 'FILLED':
+                signal = entry['signal']
+                self.trade_history.append({
+                    'symbol': signal['symbol'],
+                    'side': 'BUY',
+                    'size': executed_qty,
+                    'price': avg_price,
+                    'timestamp': time.time(),
+                    'signal_type': signal['type']
+                })
+            elif status not in ('CANCELED', 'EXPIRED'):
+                return
+            del self.open_orders[order_id]
+        
+        symbol = entry['signal']['symbol']
+        if status == 'FILLED':
+            send_telegram(f"✅ {symbol} 订单已成交 (ID: {order_id})")
+        else:
+            send_telegram(f"❌ {symbol} 订单已取消 (ID: {order_id})")
+    
+    def _timeout_worker(self):
+        """统一的订单超时处理线程"""
+        while True:
+            with self.timeout_condition:
+                while not self.order_timeouts:
+                    self.timeout_condition.wait()
+                deadline, order_id = self.order_timeouts[0]
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    self.timeout_condition.wait(remaining)
+                    continue
+                heapq.heappop(self.order_timeouts)
+                entry = self.open_orders.get(order_id)
+            
+            if entry is not None:
+                self._expire_order(order_id, entry['signal'])
+    
+    def _expire_order(self, order_id, signal):
+        """超时订单：先查询一次状态（推送可能丢失），未成交则取消"""
+        symbol = signal['symbol']
+        try:
+            if CONFIG['TRADING_TYPE'] == 'futures':
+                order_status = client.safe_request(
+                    client.client.futures_get_order,
+                    symbol=symbol,
+                    orderId=order_id
+                )
+                avg_price = float(order_status.get('avgPrice', 0))
+            else:  # spot
+                order_status = client.safe_request(
+                    client.client.get_order,
+                    symbol=symbol,
+                    orderId=order_id
+                )
+                executed_qty = float(order_status['executedQty'])
+                avg_price = float(order_status['cummulativeQuoteQty']) / executed_qty if executed_qty else 0.0
+            
+            if order_status['status'] in ('FILLED', 'CANCELED', 'EXPIRED'):
+                self._on_order_status(
+                    order_id, order_status['status'], float(order_status['executedQty']), avg_price
+                )
+                return
+        except Exception as e:
+            logger.error(f"订单状态查询异常: {str(e)}")
         
         # 超时处理
         try:
@@ -902,34 +1699,56 @@ class OrderManager:
         except Exception as e:
             logger.error(f"取消超时订单失败: {str(e)}")
         
-        if order_id in self.open_orders:
-            del self.open_orders[order_id]
-        
-        return False
+        with self.position_lock:
+            self.open_orders.pop(order_id, None)
 
 # ======================
 # 自动参数优化器
 # ======================
+def trade_history_key(trades):
+    """交易记录指纹：记录只会在末尾追加，长度与最后一笔记录即可标识其内容"""
+    if not trades:
+        return (0, None, None)
+    last = trades[-1]
+    return (len(trades), id(last), last.get('timestamp'))
+
 class ParameterOptimizer:
     def __init__(self):
         self.performance_window = CONFIG['PERFORMANCE_WINDOW']  # 从配置文件读取
+        self._risk_cache = None  # (交易记录指纹, 风险参数)
         
     def optimize_risk(self, recent_trades):
-        """基于近期表现动态调整风险参数"""
+        """基于近期表现动态调整风险参数（交易记录未变化时直接复用上次结果）"""
+        key = trade_history_key(recent_trades)
+        if self._risk_cache is not None and self._risk_cache[0] == key:
+            return self._risk_cache[1]
+        
+        risk = self._compute_risk(recent_trades)
+        self._risk_cache = (key, risk)
+        return risk
+    
+    def _compute_risk(self, recent_trades):
+        """根据近期交易的胜率和盈亏比计算风险参数"""
         if len(recent_trades) < 10:
             return CONFIG['RISK_PERCENT']
         
-        # 取最近的交易记录
-        recent = recent_trades[-self.performance_window:]
+        # 先整体复制最近的交易记录（推送线程可能同时追加），再一次性计算所有交易盈亏
+        recent = list(recent_trades)[-self.performance_window:]
+        n = len(recent)
+        pnls = np.fromiter((self._calculate_pnl(t) for t in recent), dtype=np.float64, count=n)
+        
+        # 盈利/亏损按掩码直接归约，不再分别复制出子数组
+        win_mask = pnls > 0
+        loss_mask = pnls < 0
+        wins = np.count_nonzero(win_mask)
+        losses = np.count_nonzero(loss_mask)
         
         # 计算胜率
-        profitable_trades = [t for t in recent if self._calculate_pnl(t) > 0]
-        win_rate = len(profitable_trades) / len(recent)
+        win_rate = wins / n
         
         # 计算平均盈亏比
-        avg_profit = np.mean([self._calculate_pnl(t) for t in profitable_trades]) if profitable_trades else 0
-        losing_trades = [t for t in recent if self._calculate_pnl(t) < 0]
-        avg_loss = abs(np.mean([self._calculate_pnl(t) for t in losing_trades])) if losing_trades else 1
+        avg_profit = np.sum(pnls, where=win_mask) / wins if wins else 0
+        avg_loss = abs(np.sum(pnls, where=loss_mask) / losses) if losses else 1
         
         profit_loss_ratio = avg_profit / avg_loss if avg_loss > 0 else 1
         
@@ -959,9 +1778,13 @@ class ParameterOptimizer:
             # 基于价格估算盈亏
             return 0  # 需要实际实现
 
+param_optimizer = ParameterOptimizer()
+
 # ======================
 # 灾难恢复机制
 # ======================
+RECOVERY_FILE = 'recovery.json'
+
 def save_recovery_state(order_manager):
     """保存系统状态用于灾难恢复"""
     try:
@@ -1012,14 +1835,24 @@ def save_recovery_state(order_manager):
             'positions': active_positions,
             'orders': active_orders,
             'open_orders': order_manager.open_orders,
-            'trade_history': order_manager.trade_history[-50:],  # 保存最近50笔交易
+            'trade_history': list(order_manager.trade_history),  # 已限制为最近的交易
             'timestamp': time.time(),
             'config': CONFIG,
             'trading_type': CONFIG['TRADING_TYPE']  # 保存交易类型信息
         }
         
-        with open('recovery.json', 'w') as f:
-            json.dump(recovery_data, f, indent=2, default=str)
+        # orjson直接序列化numpy标量；订单ID等非字符串键转为字符串
+        payload = orjson.dumps(
+            recovery_data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            default=str
+        )
+        
+        # 先写临时文件再原子替换，写入中途崩溃也不会留下半截的恢复文件
+        tmp_path = RECOVERY_FILE + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, RECOVERY_FILE)
             
         logger.info("恢复状态已保存")
         
@@ -1029,11 +1862,11 @@ def save_recovery_state(order_manager):
 def load_recovery_state():
     """系统崩溃后恢复状态"""
     try:
-        if not os.path.exists('recovery.json'):
+        if not os.path.exists(RECOVERY_FILE):
             return None
             
-        with open('recovery.json', 'r') as f:
-            state = json.load(f)
+        with open(RECOVERY_FILE, 'rb') as f:
+            state = orjson.loads(f.read())
             
         # 检查状态文件的有效性（1小时内）
         if time.time() - state['timestamp'] > 3600:
@@ -1052,7 +1885,8 @@ def recover_system_state(order_manager, recovery_state):
     try:
         # 恢复交易历史
         if 'trade_history' in recovery_state:
-            order_manager.trade_history = recovery_state['trade_history']
+            order_manager.trade_history.clear()
+            order_manager.trade_history.extend(recovery_state['trade_history'])
             
         # 恢复订单状态
         if 'open_orders' in recovery_state:
@@ -1096,133 +1930,330 @@ def recover_system_state(order_manager, recovery_state):
 # ======================
 # 信号生成增强
 # ======================
-@system_guard
-def generate_signal(df, symbol, current_balance, trade_history=None):
-    """增强的信号生成"""
-    if df is None or len(df) < 2:
+# 交易对参数按列展开为数组，以 SYMBOL_IDS 中的下标访问
+SYMBOL_IDS = {symbol: i for i, symbol in enumerate(_SYMBOLS_TUPLE)}
+
+def _symbol_param(getter, dtype=np.float64):
+    return np.array([getter(TRADE_SYMBOLS[s]) for s in SYMBOL_IDS], dtype=dtype)
+
+STOP_MULT_MOM = _symbol_param(lambda s: s['stop_multiplier']['MOMENTUM'])
+STOP_MULT_SWING = _symbol_param(lambda s: s['stop_multiplier']['SWING'])
+TP_MULT_MOM = _symbol_param(lambda s: s['profit_multiplier']['MOMENTUM'])
+TP_MULT_SWING = _symbol_param(lambda s: s['profit_multiplier']['SWING'])
+RISK_WEIGHT = _symbol_param(lambda s: s['risk_weight'])
+MAX_POS_USD = _symbol_param(lambda s: s['max_position_usd'])
+MIN_QTY = _symbol_param(lambda s: s['min_qty'])
+IS_USDT = np.array([s.endswith('USDT') for s in SYMBOL_IDS], dtype=np.bool_)
+VOLATILITY_FACTOR = float(CONFIG['VOLATILITY_FACTOR'])
+
+# _eval_signal 返回的信号编码
+SIGNAL_SKIP_VOLATILITY = -1
+SIGNAL_NONE = 0
+SIGNAL_MOMENTUM = 1
+SIGNAL_SWING = 2
+
+@njit(cache=True, nogil=True)
+def _eval_signal(atr, atr_mean, volatility_factor, momentum, rsi, close,
+                 bb_upper, bb_lower, ema30, ema50, volume_ratio, state_code,
+                 stop_momentum, profit_momentum, stop_swing, profit_swing):
+    """信号门限判断，返回 (信号编码, 止损价, 止盈价)"""
+    # 波动率检查
+    if atr > atr_mean * volatility_factor:
+        return SIGNAL_SKIP_VOLATILITY, np.nan, np.nan
+    
+    # 动量信号 - 增加成交量确认
+    if (momentum > 0.05 and rsi < 70 and close > bb_upper and ema30 > ema50
+            and volume_ratio > 1.2 and state_code == MARKET_STATE_TRENDING):
+        return SIGNAL_MOMENTUM, close - stop_momentum * atr, close + profit_momentum * atr
+    
+    # 波段信号 - 增加趋势确认
+    if rsi < 40 and close < bb_lower and ema30 > ema50 and volume_ratio > 1.1:
+        return SIGNAL_SWING, close - stop_swing * atr, close + profit_swing * atr
+    
+    return SIGNAL_NONE, np.nan, np.nan
+
+@njit(cache=True, nogil=True)
+def _eval_signals(last, atr_mean, state_codes, volatility_factor,
+                  stop_momentum, profit_momentum, stop_swing, profit_swing,
+                  codes, stops, profits):
+    """批量门限判断：last 为各交易对最新指标按行堆叠 (atr, momentum, rsi, close,
+    bb_upper, bb_lower, ema30, ema50, volume_ratio)，结果写入 codes/stops/profits"""
+    for i in range(last.shape[1]):
+        codes[i], stops[i], profits[i] = _eval_signal(
+            last[0, i], atr_mean[i], volatility_factor, last[1, i], last[2, i], last[3, i],
+            last[4, i], last[5, i], last[6, i], last[7, i], last[8, i], state_codes[i],
+            stop_momentum[i], profit_momentum[i], stop_swing[i], profit_swing[i]
+        )
+
+@njit(cache=True, nogil=True)
+def _position_size_kernel(balance, risk_percent, risk_weight, atr, price,
+                          multiplier, is_usdt, max_position_usd):
+    """仓位计算的纯数值部分"""
+    # 基础风险金额
+    base_risk = balance * risk_percent * risk_weight
+    
+    # 根据波动率调整
+    volatility_adj = min(atr / price * 100, 5.0)  # 限制最大调整
+    adjusted_risk = base_risk * (1 - volatility_adj * 0.1)
+    
+    # 计算仓位
+    position_size = adjusted_risk / (multiplier * atr)
+    
+    # 转换为合约数量
+    if is_usdt:
+        position_size = position_size / price
+    
+    # 限制最大持仓
+    max_position = max_position_usd / price
+    if max_position < position_size:
+        position_size = max_position
+    return position_size
+
+def warmup_jit():
+    """启动时预编译/加载数值内核，避免交易循环中首次调用的JIT延迟"""
+    start = time.time()
+    high = np.linspace(101.0, 200.0, 100)
+    low = high - 2.0
+    close = high - 1.0
+    for values in (high, low, close):
+        values.flags.writeable = False  # K线数组均为只读，按相同类型签名编译
+    out = np.empty((8, len(close)), dtype=np.float64)
+    compute_indicators_kernel(high, low, close, *INDICATOR_PARAMS, out)
+    StreamingState.from_candles(Candles(np.arange(len(close)), close, high, low, close, close))
+    _eval_signal(1.0, 1.0, 1.5, 0.1, 50.0, 100.0, 99.0, 90.0, 2.0, 1.0, 1.5,
+                 MARKET_STATE_TRENDING, 2.0, 3.0, 1.5, 2.0)
+    ones = np.ones(2)
+    _eval_signals(np.ones((9, 2)), ones, np.ones(2, dtype=np.int64), 1.5,
+                  ones, ones, ones, ones, np.empty(2, dtype=np.int64), np.empty(2), np.empty(2))
+    _position_size_kernel(1000.0, 0.02, 1.0, 1.0, 100.0, 2.0, True, 500.0)
+    logger.info(f"数值内核预热完成，耗时 {time.time() - start:.2f}s")
+
+def generate_signal(snap, symbol, current_balance, trade_history=None):
+    """增强的信号生成（snap 为 calculate_indicators 返回的指标快照）"""
+    if snap is None or len(snap.close) < 2 or len(snap.atr) != len(snap.close):
         return None
     
-    try:
-        current = df.iloc[-1]
-        prev = df.iloc[-2]
-        
-        # 波动率检查
-        if current['atr'] > df['atr'].mean() * CONFIG['VOLATILITY_FACTOR']:
-            logger.warning(f"{symbol} 波动率过高，跳过信号")
-            return None
-        
-        # 动量信号 - 增加成交量确认
-        momentum_signal = all([
-            current['momentum'] > 0.05,
-            current['rsi'] < 70,
-            current['close'] > current['bb_upper'],
-            current['ema30'] > current['ema50'],
-            current['volume_ratio'] > 1.2,  # 成交量放大
-            current['market_state'] == 'TRENDING'
-        ])
-        
-        # 波段信号 - 增加趋势确认
-        swing_signal = all([
-            current['rsi'] < 40,
-            current['close'] < current['bb_lower'],
-            current['ema30'] > current['ema50'],
-            current['volume_ratio'] > 1.1
-        ])
-        
-        # 仓位计算（使用动态风险参数）
-        position_size = calculate_position_size(
-            symbol, current_balance,
-            'MOMENTUM' if momentum_signal else 'SWING',
-            current['atr'], current['close'], trade_history
+    # 最新一根K线的指标取为标量
+    close = snap.close[-1]
+    momentum = snap.momentum[-1]
+    rsi = snap.rsi[-1]
+    atr = snap.atr[-1]
+    ema30 = snap.ema30[-1]
+    ema50 = snap.ema50[-1]
+    bb_upper = snap.bb_upper[-1]
+    bb_lower = snap.bb_lower[-1]
+    volume_ratio = snap.volume_ratio[-1]
+    state_code = int(snap.market_state[-1])
+    atr_mean = snap.atr_mean
+    
+    # 波动率与动量/波段门限判断（JIT内核）
+    sid = SYMBOL_IDS[symbol]
+    code, stop_loss, take_profit = _eval_signal(
+        atr, atr_mean, VOLATILITY_FACTOR, momentum, rsi, close,
+        bb_upper, bb_lower, ema30, ema50, volume_ratio, state_code,
+        STOP_MULT_MOM[sid], TP_MULT_MOM[sid], STOP_MULT_SWING[sid], TP_MULT_SWING[sid]
+    )
+    
+    if code == SIGNAL_SKIP_VOLATILITY:
+        logger.warning(f"{symbol} 波动率过高，跳过信号")
+        return None
+    if code == SIGNAL_NONE:
+        return None
+    return _build_signal(snap, symbol, code, stop_loss, take_profit, current_balance, trade_history)
+
+# 信号缓存：symbol -> (指标快照, 交易记录指纹, 门限结果(code, 止损, 止盈), 余额, 信号)
+# 快照对象未更新（同一根K线）且交易记录不变时复用门限判断；余额每轮重新查询，
+# 变化时只按新余额重新计算仓位和信号，不重新判断门限
+_LAST_SIG = {}
+_LAST_SIG_STATS = {'hit': 0, 'miss': 0}
+SIGNAL_CACHE_LOG_EVERY = 100
+
+def _record_signal_cache(hits, misses):
+    """累计信号缓存命中情况，每 SIGNAL_CACHE_LOG_EVERY 次查询记录一次命中率"""
+    stats = _LAST_SIG_STATS
+    stats['hit'] += hits
+    stats['miss'] += misses
+    total = stats['hit'] + stats['miss']
+    if total >= SIGNAL_CACHE_LOG_EVERY:
+        logger.info(f"信号缓存命中率: {stats['hit'] / total:.1%} ({total}次)")
+        stats['hit'] = stats['miss'] = 0
+
+def generate_signals(snaps, current_balance, trade_history=None):
+    """批量信号生成：snaps 为 {symbol: 指标快照}，一次内核调用判断全部交易对的门限"""
+    history_key = trade_history_key(trade_history)
+    signals = {}
+    symbols = []
+    hits = 0
+    for symbol, snap in snaps.items():
+        if snap is None or len(snap.close) < 2 or len(snap.atr) != len(snap.close):
+            continue
+        cached = _LAST_SIG.get(symbol)
+        if cached is not None and cached[0] is snap and cached[1] == history_key:
+            hits += 1
+            code, stop_loss, take_profit = cached[2]
+            signal = cached[4]
+            if code > SIGNAL_NONE and cached[3] != current_balance:
+                signal = _build_signal(
+                    snap, symbol, code, stop_loss, take_profit, current_balance, trade_history
+                )
+                _LAST_SIG[symbol] = cached[:3] + (current_balance, signal)
+            if signal:
+                signals[symbol] = dict(signal)
+        else:
+            symbols.append(symbol)
+    _record_signal_cache(hits, len(symbols))
+    if not symbols:
+        return signals
+    
+    # 各交易对最新一根K线的指标按列堆叠为 (N,) 数组
+    last = np.array([
+        (snap.atr[-1], snap.momentum[-1], snap.rsi[-1], snap.close[-1], snap.bb_upper[-1],
+         snap.bb_lower[-1], snap.ema30[-1], snap.ema50[-1], snap.volume_ratio[-1])
+        for snap in (snaps[symbol] for symbol in symbols)
+    ], dtype=np.float64).T.copy()
+    atr_mean = np.array([snaps[symbol].atr_mean for symbol in symbols])
+    state_codes = np.array([snaps[symbol].market_state[-1] for symbol in symbols], dtype=np.int64)
+    sids = np.array([SYMBOL_IDS[symbol] for symbol in symbols], dtype=np.intp)
+    
+    codes = np.empty(len(symbols), dtype=np.int64)
+    stops = np.empty(len(symbols), dtype=np.float64)
+    profits = np.empty(len(symbols), dtype=np.float64)
+    _eval_signals(
+        last, atr_mean, state_codes, VOLATILITY_FACTOR,
+        STOP_MULT_MOM[sids], TP_MULT_MOM[sids], STOP_MULT_SWING[sids], TP_MULT_SWING[sids],
+        codes, stops, profits
+    )
+    
+    for i in np.flatnonzero(codes == SIGNAL_SKIP_VOLATILITY):
+        logger.warning(f"{symbols[i]} 波动率过高，跳过信号")
+    
+    # 只为触发门限的交易对计算仓位并构建信号
+    # 缓存保存原始信号，返回副本，下单流程写入的字段不会污染缓存
+    for i, symbol in enumerate(symbols):
+        code = int(codes[i])
+        signal = None
+        if code > SIGNAL_NONE:
+            signal = _build_signal(
+                snaps[symbol], symbol, code, stops[i], profits[i], current_balance, trade_history
+            )
+        _LAST_SIG[symbol] = (
+            snaps[symbol], history_key, (code, stops[i], profits[i]), current_balance, signal
         )
+        if signal:
+            signals[symbol] = dict(signal)
+    return signals
+
+def _build_signal(snap, symbol, code, stop_loss, take_profit, current_balance, trade_history):
+    """为已触发门限的交易对计算仓位、信号强度和原因"""
+    # 最新一根K线的指标取为标量
+    close = snap.close[-1]
+    momentum = snap.momentum[-1]
+    rsi = snap.rsi[-1]
+    atr = snap.atr[-1]
+    ema30 = snap.ema30[-1]
+    ema50 = snap.ema50[-1]
+    bb_upper = snap.bb_upper[-1]
+    bb_lower = snap.bb_lower[-1]
+    volume_ratio = snap.volume_ratio[-1]
+    market_state = MARKET_STATES[snap.market_state[-1]]
+    
+    # 仓位计算（使用动态风险参数）
+    position_size = calculate_position_size(
+        symbol, current_balance,
+        'MOMENTUM' if code == SIGNAL_MOMENTUM else 'SWING',
+        atr, close, trade_history
+    )
+    
+    if not position_size:
+        return None
+    
+    # 计算信号强度和分析原因
+    if code == SIGNAL_MOMENTUM:
+        # 计算动量信号强度
+        strength_factors = {
+            'momentum': min(momentum * 10, 25),  # 最大25分
+            'rsi': max(0, 30 - (rsi - 50)) / 30 * 20,  # 最大20分
+            'bb_breakout': 15 if close > bb_upper else 0,  # 15分
+            'ema_trend': 15 if ema30 > ema50 else 0,  # 15分
+            'volume': min((volume_ratio - 1) * 25, 25),  # 最大25分
+            'market_state': 10 if market_state == 'TRENDING' else 0  # 10分
+        }
         
-        if not position_size:
-            return None
+        confidence = sum(strength_factors.values())
+        
+        reasons = []
+        if strength_factors['momentum'] > 0:
+            reasons.append(f"动量突破({momentum:.2%})")
+        if strength_factors['bb_breakout'] > 0:
+            reasons.append("布林带上轨突破")
+        if strength_factors['ema_trend'] > 0:
+            reasons.append("EMA多头排列")
+        if strength_factors['volume'] > 0:
+            reasons.append(f"成交量放大({volume_ratio:.1f}x)")
+        if strength_factors['market_state'] > 0:
+            reasons.append("趋势市场确认")
+        
+        return {
+            'symbol': symbol,
+            'signal': 'BUY',
+            'type': 'MOMENTUM',
+            'size': position_size,
+            'price': close,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'confidence': min(confidence, 100),  # 限制最大100%
+            'reason': ' + '.join(reasons),
+            'rsi': rsi,
+            'atr': atr,
+            'volume_ratio': volume_ratio,
+            'market_state': market_state
+        }
         
-        # 计算信号强度和分析原因
-        if momentum_signal:
-            # 计算动量信号强度
-            strength_factors = {
-                'momentum': min(current['momentum'] * 10, 25),  # 最大25分
-                'rsi': max(0, 30 - (current['rsi'] - 50)) / 30 * 20,  # 最大20分
-                'bb_breakout': 15 if current['close'] > current['bb_upper'] else 0,  # 15分
-                'ema_trend': 15 if current['ema30'] > current['ema50'] else 0,  # 15分
-                'volume': min((current['volume_ratio'] - 1) * 25, 25),  # 最大25分
-                'market_state': 10 if current['market_state'] == 'TRENDING' else 0  # 10分
-            }
-            
-            confidence = sum(strength_factors.values())
-            
-            reasons = []
-            if strength_factors['momentum'] > 0:
-                reasons.append(f"动量突破({current['momentum']:.2%})")
-            if strength_factors['bb_breakout'] > 0:
-                reasons.append("布林带上轨突破")
-            if strength_factors['ema_trend'] > 0:
-                reasons.append("EMA多头排列")
-            if strength_factors['volume'] > 0:
-                reasons.append(f"成交量放大({current['volume_ratio']:.1f}x)")
-            if strength_factors['market_state'] > 0:
-                reasons.append("趋势市场确认")
-            
-            return {
-                'symbol': symbol,
-                'signal': 'BUY',
-                'type': 'MOMENTUM',
-                'size': position_size,
-                'price': current['close'],
-                'stop_loss': current['close'] - TRADE_SYMBOLS[symbol]['stop_multiplier']['MOMENTUM'] * current['atr'],
-                'take_profit': current['close'] + TRADE_SYMBOLS[symbol]['profit_multiplier']['MOMENTUM'] * current['atr'],
-                'confidence': min(confidence, 100),  # 限制最大100%
-                'reason': ' + '.join(reasons),
-                'rsi': current['rsi'],
-                'atr': current['atr'],
-                'volume_ratio': current['volume_ratio'],
-                'market_state': current['market_state']
-            }
-            
-        elif swing_signal:
-            # 计算波段信号强度
-            strength_factors = {
-                'rsi_oversold': max(0, (40 - current['rsi']) / 40 * 30),  # 最大30分
-                'bb_support': 20 if current['close'] < current['bb_lower'] else 0,  # 20分
-                'ema_trend': 15 if current['ema30'] > current['ema50'] else 0,  # 15分
-                'volume': min((current['volume_ratio'] - 1) * 20, 20),  # 最大20分
-                'mean_reversion': 15  # 均值回归基础分
-            }
-            
-            confidence = sum(strength_factors.values())
-            
-            reasons = []
-            if strength_factors['rsi_oversold'] > 0:
-                reasons.append(f"RSI超卖({current['rsi']:.1f})")
-            if strength_factors['bb_support'] > 0:
-                reasons.append("布林带下轨支撑")
-            if strength_factors['ema_trend'] > 0:
-                reasons.append("EMA多头排列")
-            if strength_factors['volume'] > 0:
-                reasons.append(f"成交量配合({current['volume_ratio']:.1f}x)")
-            reasons.append("均值回归机会")
-            
-            return {
-                'symbol': symbol,
-                'signal': 'BUY',
-                'type': 'SWING',
-                'size': position_size,
-                'price': current['close'],
-                'stop_loss': current['close'] - TRADE_SYMBOLS[symbol]['stop_multiplier']['SWING'] * current['atr'],
-                'take_profit': current['close'] + TRADE_SYMBOLS[symbol]['profit_multiplier']['SWING'] * current['atr'],
-                'confidence': min(confidence, 100),  # 限制最大100%
-                'reason': ' + '.join(reasons),
-                'rsi': current['rsi'],
-                'atr': current['atr'],
-                'volume_ratio': current['volume_ratio'],
-                'market_state': current['market_state']
-            }
+    else:
+        # 计算波段信号强度
+        strength_factors = {
+            'rsi_oversold': max(0, (40 - rsi) / 40 * 30),  # 最大30分
+            'bb_support': 20 if close < bb_lower else 0,  # 20分
+            'ema_trend': 15 if ema30 > ema50 else 0,  # 15分
+            'volume': min((volume_ratio - 1) * 20, 20),  # 最大20分
+            'mean_reversion': 15  # 均值回归基础分
+        }
         
-        return None
+        confidence = sum(strength_factors.values())
+        
+        reasons = []
+        if strength_factors['rsi_oversold'] > 0:
+            reasons.append(f"RSI超卖({rsi:.1f})")
+        if strength_factors['bb_support'] > 0:
+            reasons.append("布林带下轨支撑")
+        if strength_factors['ema_trend'] > 0:
+            reasons.append("EMA多头排列")
+        if strength_factors['volume'] > 0:
+            reasons.append(f"成交量配合({volume_ratio:.1f}x)")
+        reasons.append("均值回归机会")
+        
+        return {
+            'symbol': symbol,
+            'signal': 'BUY',
+            'type': 'SWING',
+            'size': position_size,
+            'price': close,
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'confidence': min(confidence, 100),  # 限制最大100%
+            'reason': ' + '.join(reasons),
+            'rsi': rsi,
+            'atr': atr,
+            'volume_ratio': volume_ratio,
+            'market_state': market_state
+        }
+
+def generate_signal_safe(snap, symbol, current_balance, trade_history=None):
+    """带异常保护的信号生成，供工作线程调用"""
+    try:
+        return generate_signal(snap, symbol, current_balance, trade_history)
     except Exception as e:
-        logger.error(f"信号生成失败: {str(e)}")
+        logger.error(f"{symbol} 信号生成失败: {str(e)}")
         return None
 
 def calculate_position_size(symbol, balance, signal_type, atr, price, trade_history=None):
@@ -1230,33 +2261,19 @@ def calculate_position_size(symbol, balance, signal_type, atr, price, trade_hist
     try:
         # 获取动态调整的风险参数
         if trade_history and len(trade_history) > 0:
-            optimizer = ParameterOptimizer()
-            risk_percent = optimizer.optimize_risk(trade_history)
+            risk_percent = param_optimizer.optimize_risk(trade_history)
         else:
             risk_percent = CONFIG['RISK_PERCENT']
         
-        # 基础风险金额
-        base_risk = balance * risk_percent * TRADE_SYMBOLS[symbol]['risk_weight']
-        
-        # 根据波动率调整
-        volatility_adj = min(atr / price * 100, 5.0)  # 限制最大调整
-        adjusted_risk = base_risk * (1 - volatility_adj * 0.1)
-        
-        # 计算仓位
-        multiplier = TRADE_SYMBOLS[symbol]['stop_multiplier'][signal_type]
-        position_size = adjusted_risk / (multiplier * atr)
-        
-        # 转换为合约数量
-        if symbol.endswith('USDT'):
-            position_size = position_size / price
-        
-        # 限制最大持仓
-        max_position = TRADE_SYMBOLS[symbol]['max_position_usd'] / price
-        position_size = min(position_size, max_position)
+        sid = SYMBOL_IDS[symbol]
+        multiplier = STOP_MULT_MOM[sid] if signal_type == 'MOMENTUM' else STOP_MULT_SWING[sid]
+        position_size = _position_size_kernel(
+            float(balance), float(risk_percent), RISK_WEIGHT[sid],
+            float(atr), float(price), multiplier, IS_USDT[sid], MAX_POS_USD[sid]
+        )
         
         # 最小交易量检查
-        min_qty = TRADE_SYMBOLS[symbol]['min_qty']
-        if position_size < min_qty:
+        if position_size < MIN_QTY[sid]:
             return None
             
         return round(position_size, 5)
@@ -1267,23 +2284,24 @@ def calculate_position_size(symbol, balance, signal_type, atr, price, trade_hist
 # ======================
 # 系统监控
 # ======================
-def system_monitor():
-    """系统实时监控"""
+async def system_monitor():
+    """系统实时监控（运行在共享事件循环中）"""
+    ping_url = api_endpoint('ping')
     while True:
         try:
-            # API延迟检测
+            # API延迟检测（复用持久连接）
+            http = await get_http_session()
             start_time = time.time()
-            if CONFIG['TRADING_TYPE'] == 'futures':
-                client.safe_request(client.client.futures_ping)
-            else:  # spot
-                client.safe_request(client.client.ping)
+            async with http.get(ping_url) as resp:
+                resp.raise_for_status()
+                await resp.read()
             latency = (time.time() - start_time) * 1000
             
             if latency > 500:
                 send_telegram(f"⚠️ API延迟过高: {latency:.0f}ms")
             
             # 系统资源监控
-            memory_percent = psutil.virtual_memory().percent
+            memory_percent = get_memory_percent(max_age=0)
             cpu_percent = psutil.cpu_percent()
             
             if memory_percent > 80:
@@ -1291,10 +2309,10 @@ def system_monitor():
             if cpu_percent > 90:
                 send_telegram(f"🔴 CPU使用{cpu_percent:.1f}%")
                 
-            time.sleep(CONFIG['SYSTEM_MONITOR_INTERVAL'])  # 从配置文件读取间隔
+            await asyncio.sleep(CONFIG['SYSTEM_MONITOR_INTERVAL'])  # 从配置文件读取间隔
         except Exception as e:
             logger.error(f"系统监控异常: {str(e)}")
-            time.sleep(60)
+            await asyncio.sleep(60)
 
 # ======================
 # 初始化函数
@@ -1304,7 +2322,7 @@ def initialize_account():
     if CONFIG['TRADING_TYPE'] == 'futures':
         logger.info("开始初始化期货账户...")
         
-        for symbol in TRADE_SYMBOLS:
+        for symbol in _SYMBOLS_TUPLE:
             try:
                 # 先获取当前持仓信息，检查保证金类型
                 try:
@@ -1387,6 +2405,49 @@ def initialize_account():
 # ======================
 # 主程序
 # ======================
+# 主循环周期与单个交易对成交后的冷却时间（秒）
+CYCLE_SECONDS = 300
+TRADE_COOLDOWN = 60
+
+# 交易对并发处理线程池，行情获取与指标计算并行，下单仍在主线程串行执行
+symbol_pool = ThreadPoolExecutor(max_workers=len(TRADE_SYMBOLS), thread_name_prefix='symbol')
+
+def _next_midnight_ts():
+    """下一个本地零点的时间戳，作为交易日边界"""
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+# REST回退路径的指标快照缓存：symbol -> (最新已收盘K线的开盘时间, 快照)
+# fetch_klines只返回已收盘K线，开盘时间不变即数据不变
+_SNAPSHOT_CACHE = {}
+
+def _fetch_snapshot(symbol):
+    """获取单个交易对的最新价格和指标快照"""
+    # 获取当前价格及其接收时间
+    tick = get_current_tick(symbol)
+    if tick is None:
+        return None
+    current_price, price_time = tick
+    
+    # 优先读取推送增量维护的指标，不可用时获取K线批量计算
+    snap = kline_stream.get_snapshot(symbol, SNAPSHOT_LENGTH)
+    if snap is None:
+        candles = fetch_klines(symbol, CONFIG['TRADE_INTERVAL'])
+        if candles is None:
+            return None
+        
+        # 没有新收盘K线时复用上次的指标快照
+        bar_time = int(candles.timestamp[-1])
+        cached = _SNAPSHOT_CACHE.get(symbol)
+        if cached is not None and cached[0] == bar_time:
+            snap = cached[1]
+        else:
+            snap = calculate_indicators(candles)
+            if snap is None:
+                return None
+            _SNAPSHOT_CACHE[symbol] = (bar_time, snap)
+    return current_price, price_time, snap
+
 def main():
     """主交易循环"""
     logger.info("交易机器人启动")
@@ -1397,15 +2458,20 @@ def main():
     # 初始化
     initialize_account()
     order_manager = OrderManager()
+    order_manager.start_order_stream()
     
     # 如果有恢复状态，则恢复系统
     if recovery_state:
         recover_system_state(order_manager, recovery_state)
     
+    # 预热数值内核
+    warmup_jit()
+    
+    # 启动K线推送
+    kline_stream.start()
+    
     # 启动系统监控
-    monitor_thread = threading.Thread(target=system_monitor)
-    monitor_thread.daemon = True
-    monitor_thread.start()
+    asyncio.run_coroutine_threadsafe(system_monitor(), get_async_loop())
     
     # 发送启动通知
     market_data_status = "✅ 开启" if CONFIG['ENABLE_MARKET_DATA'] else "❌ 关闭"
@@ -1416,78 +2482,111 @@ def main():
         f"版本: 1.0 \n"
         f"杠杆: {CONFIG['LEVERAGE']}x\n"
         f"风险: {CONFIG['RISK_PERCENT']*100:.2f}%\n"
-        f"币种: {', '.join(TRADE_SYMBOLS.keys())}\n"
+        f"币种: {_SYMBOLS_STR}\n"
         f"📊 市场数据推送: {market_data_status}\n"
         f"⏰ 推送频率: {interval_text}"
     )
     
     # 主循环变量
     daily_trade_count = 0
-    last_trade_day = datetime.now().strftime('%Y-%m-%d')
+    next_midnight = _next_midnight_ts()
     last_save_time = time.time()
     last_market_data_time = {}  # 记录每个交易对上次发送市场数据的时间
+    last_trade_ts = {}  # 记录每个交易对上次成交的时间
+    last_trade_bar = {}  # 记录每个交易对上次成交信号所在K线的开盘时间
+    enable_market_data = CONFIG['ENABLE_MARKET_DATA']
+    market_data_interval = CONFIG['MARKET_DATA_INTERVAL']
     
     while True:
+        cycle_start = time.monotonic()
         try:
-            current_day = datetime.now().strftime('%Y-%m-%d')
-            
             # 新的一天重置计数
-            if current_day != last_trade_day:
+            if time.time() >= next_midnight:
                 daily_trade_count = 0
-                last_trade_day = current_day
-                send_telegram(f"📅 新的交易日开始: {current_day}")
+                next_midnight = _next_midnight_ts()
+                send_telegram(f"📅 新的交易日开始: {datetime.now().strftime('%Y-%m-%d')}")
             
             # 每日交易限制检查
             if daily_trade_count >= CONFIG['MAX_DAILY_TRADES']:
                 time.sleep(3600)  # 等待1小时
                 continue
             
-            # 遍历交易对
-            for symbol in TRADE_SYMBOLS:
-                # 获取当前价格
-                current_price = get_current_price(symbol)
-                if current_price is None:
-                    continue
-                
-                # 获取数据
-                df = fetch_klines(symbol, CONFIG['TRADE_INTERVAL'])
-                if df is None:
-                    continue
-                
-                # 计算指标
-                df = calculate_indicators(df)
-                if df is None:
+            # 推送数据不可用的交易对，并发预取K线
+            pending_symbols = [
+                symbol for symbol in _SYMBOLS_TUPLE
+                if kline_stream.socket_name is None or symbol in kline_stream.needs_backfill
+            ]
+            if pending_symbols:
+                prefetch_klines(pending_symbols, CONFIG['TRADE_INTERVAL'])
+            
+            # 每轮只查询一次余额，成交后再刷新
+            current_balance = order_manager._get_account_balance()
+            balance_changed = False
+            
+            # 并发获取各交易对的价格和指标
+            now = time.time()
+            futures = {
+                symbol_pool.submit(_fetch_snapshot, symbol): symbol
+                for symbol in _SYMBOLS_TUPLE
+                if now - last_trade_ts.get(symbol, 0) >= TRADE_COOLDOWN  # 成交后冷却中的交易对跳过
+            }
+            market = {}
+            for future in as_completed(futures):
+                result = future.result()
+                if result is not None:
+                    market[futures[future]] = result
+            
+            # 批量判断全部交易对的信号，再按交易对顺序串行处理推送和下单
+            signals = generate_signals(
+                {symbol: result[2] for symbol, result in market.items()},
+                current_balance, order_manager.trade_history
+            )
+            for symbol in _SYMBOLS_TUPLE:
+                if symbol not in market:
                     continue
+                current_price, price_time, snap = market[symbol]
+                signal = signals.get(symbol)
                 
                 # 获取最新指标数据
-                latest_data = df.iloc[-1]
                 indicators = {
-                    'rsi': latest_data.get('rsi', 0),
-                    'atr': latest_data.get('atr', 0),
-                    'adx': latest_data.get('adx', 0),
-                    'volume_ratio': latest_data.get('volume_ratio', 0),
-                    'ema30': latest_data.get('ema30', 0),
-                    'ema50': latest_data.get('ema50', 0),
-                    'bb_upper': latest_data.get('bb_upper', 0),
-                    'bb_lower': latest_data.get('bb_lower', 0)
+                    'rsi': snap.rsi[-1],
+                    'atr': snap.atr[-1],
+                    'adx': snap.adx[-1],
+                    'volume_ratio': snap.volume_ratio[-1],
+                    'ema30': snap.ema30[-1],
+                    'ema50': snap.ema50[-1],
+                    'bb_upper': snap.bb_upper[-1],
+                    'bb_lower': snap.bb_lower[-1]
                 }
                 
-                market_state = latest_data.get('market_state', 'UNKNOWN')
+                market_state = MARKET_STATES[snap.market_state[-1]]
                 
                 # 发送市场数据到Telegram（控制频率）
-                if CONFIG['ENABLE_MARKET_DATA']:
+                if enable_market_data:
                     current_time = time.time()
                     if (symbol not in last_market_data_time or 
-                        current_time - last_market_data_time[symbol] >= CONFIG['MARKET_DATA_INTERVAL']):
+                        current_time - last_market_data_time[symbol] >= market_data_interval):
                         send_market_data_telegram(symbol, current_price, indicators, market_state)
                         last_market_data_time[symbol] = current_time
                 
-                # 生成信号
-                current_balance = order_manager._get_account_balance()
-                signal = generate_signal(df, symbol, current_balance, order_manager.trade_history)
+                # 信号基于最新已收盘K线，同一根K线只成交一次，避免在下一根K线收盘前每轮重复下单
+                bar_time = int(snap.timestamp[-1])
+                if signal and last_trade_bar.get(symbol) == bar_time:
+                    signal = None
+                
+                # 本轮已有成交时，按刷新后的余额重新计算仓位
+                if signal and balance_changed:
+                    signal = generate_signal_safe(snap, symbol, current_balance, order_manager.trade_history)
                 
                 # 发送信号分析（如果有信号）
                 if signal:
+                    # 入场价改用实时价格，止损止盈保持相同的ATR距离随之平移
+                    offset = current_price - signal['price']
+                    signal['bar_close'] = signal['price']
+                    signal['price'] = current_price
+                    signal['stop_loss'] += offset
+                    signal['take_profit'] += offset
+                    signal['tick'] = (current_price, price_time)
                     send_signal_analysis_telegram(symbol, signal)
                     
                     # 执行交易
@@ -1498,20 +2597,23 @@ def main():
                     
                     if execution_result and execution_result.get('success'):
                         daily_trade_count += 1
-                        time.sleep(60)  # 交易后暂停1分钟
+                        last_trade_ts[symbol] = time.time()
+                        last_trade_bar[symbol] = bar_time
+                        current_balance = order_manager._get_account_balance()
+                        balance_changed = True
             
             # 定期保存系统状态
             if time.time() - last_save_time > CONFIG['RECOVERY_SAVE_INTERVAL']:
                 save_recovery_state(order_manager)
                 last_save_time = time.time()
             
-            # 休眠到下个周期
-            time.sleep(300)  # 5分钟检查一次
+            # 休眠到下个周期（扣除本轮处理耗时，保持5分钟节奏）
+            time.sleep(max(0, CYCLE_SECONDS - (time.monotonic() - cycle_start)))
             
         except KeyboardInterrupt:
             logger.info("收到停止信号，正在安全退出...")
             save_recovery_state(order_manager)  # 退出前保存状态
-            send_telegram("🛑 交易机器人已停止")
+            send_telegram("🛑 交易机器人已停止", immediate=True)
             break
         except Exception as e:
             logger.error(f"主循环异常: {str(e)}")
@@ -1528,7 +2630,7 @@ if __name__ == "__main__":
     print(f"交易类型: {'期货' if CONFIG['TRADING_TYPE'] == 'futures' else '现货'}")
     print(f"杠杆: {CONFIG['LEVERAGE']}x" if CONFIG['TRADING_TYPE'] == 'futures' else "杠杆: 无（现货交易）")
     print(f"风险比例: {CONFIG['RISK_PERCENT']*100:.2f}%")
-    print(f"交易品种: {', '.join(TRADE_SYMBOLS.keys())}")
+    print(f"交易品种: {_SYMBOLS_STR}")
     print(f"测试模式: {'是' if CONFIG['TESTNET'] else '否'}")
     print("=" * 50)
     